@@ -0,0 +1,201 @@
+"""
+Pre-aggregated prediction rollups for dashboards.
+
+prediction_rollups keeps, per user and per bucket of each dimension, the
+number of predictions, how many were approved, the sum of approval
+probabilities and a 10-bin probability histogram. update_rollups() folds
+each batch of inserted rows into it inside the insert's own transaction,
+so dashboard reads cost O(buckets) instead of a scan over predictions.
+Given the model's categorical lookups, grade and purpose buckets are the
+encoder classes, so every spelling of a class lands in one bucket.
+rebuild_rollups() recomputes them from the raw history:
+
+    python analytics.py --rebuild [--user-id 7] [--model-dir DIR]
+"""
+import argparse
+import os
+
+import joblib
+
+from encoding import compile_lookups
+from registry import DEFAULT_ARTIFACT_DIR
+from storage import Database, DB_PATH, PREDICTION_COLUMNS
+
+# Rollup dimension -> predictions column (day buckets are the created_at date)
+DIMENSIONS = {
+    "grade_subgrade": "grade_subgrade",
+    "loan_purpose": "loan_purpose",
+    "day": "created_at",
+}
+HISTOGRAM_BINS = 10
+# Rows per fetch when rebuilding from the predictions table
+REBUILD_CHUNK_ROWS = 5000
+HISTOGRAM_COLUMNS = [f"h{i}" for i in range(HISTOGRAM_BINS)]
+ROLLUP_COLUMNS = ["user_id", "dimension", "bucket", "n", "approved", "probability_sum", *HISTOGRAM_COLUMNS]
+
+_USER = PREDICTION_COLUMNS.index("user_id")
+_PREDICTION = PREDICTION_COLUMNS.index("prediction")
+_PROBABILITY = PREDICTION_COLUMNS.index("probability")
+_DIMENSION_INDEX = {dimension: PREDICTION_COLUMNS.index(column) for dimension, column in DIMENSIONS.items()}
+
+UPSERT_ROLLUP = (
+    f"INSERT INTO prediction_rollups ({', '.join(ROLLUP_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(ROLLUP_COLUMNS))}) "
+    "ON CONFLICT (user_id, dimension, bucket) DO UPDATE SET "
+    + ", ".join(f"{col}={col}+excluded.{col}" for col in ROLLUP_COLUMNS[3:])
+)
+
+
+def create_rollup_table(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS prediction_rollups (
+        user_id INTEGER NOT NULL,
+        dimension TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        approved INTEGER NOT NULL DEFAULT 0,
+        probability_sum REAL NOT NULL DEFAULT 0,
+        {', '.join(f'{col} INTEGER NOT NULL DEFAULT 0' for col in HISTOGRAM_COLUMNS)},
+        PRIMARY KEY (user_id, dimension, bucket)
+    )
+    """)
+
+
+def _bucket(dimension, value, lookup=None):
+    if value is None:
+        return ""
+    if dimension == "day":
+        return str(value)[:10]
+    if lookup is not None:
+        cls = lookup.class_of(value)
+        if cls is not None:
+            return str(cls)
+    return str(value)
+
+
+def _histogram_bin(probability):
+    return min(int(probability * HISTOGRAM_BINS), HISTOGRAM_BINS - 1)
+
+
+def _fold(totals, rows, lookups):
+    """Add prediction rows to totals, keyed (user_id, dimension, bucket)"""
+    lookups = lookups or {}
+    # Raw value -> bucket per dimension, so each distinct spelling is resolved once
+    buckets = {dimension: {} for dimension in DIMENSIONS}
+    for row in rows:
+        probability = row[_PROBABILITY]
+        approved = int(row[_PREDICTION] == 1)
+        hist_bin = _histogram_bin(probability)
+        for dimension, idx in _DIMENSION_INDEX.items():
+            value = row[idx]
+            try:
+                bucket = buckets[dimension][value]
+            except KeyError:
+                bucket = buckets[dimension][value] = _bucket(dimension, value, lookups.get(DIMENSIONS[dimension]))
+            key = (row[_USER], dimension, bucket)
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = [0, 0, 0.0] + [0] * HISTOGRAM_BINS
+            total[0] += 1
+            total[1] += approved
+            total[2] += probability
+            total[3 + hist_bin] += 1
+    return totals
+
+
+def update_rollups(conn, rows, lookups=None):
+    """
+    Fold inserted prediction rows (tuples in PREDICTION_COLUMNS order) into
+    the rollups; lookups maps columns to the model's CategoricalLookup
+    """
+    totals = _fold({}, rows, lookups)
+    conn.executemany(UPSERT_ROLLUP, [(*key, *total) for key, total in totals.items()])
+
+
+def rebuild_rollups(conn, user_id=None, lookups=None, chunk_rows=REBUILD_CHUNK_ROWS):
+    """Recompute the rollups (for one user, or everyone) from the predictions table"""
+    where, params = ("WHERE user_id=?", (user_id,)) if user_id is not None else ("", ())
+    conn.execute(f"DELETE FROM prediction_rollups {where}", params)
+    # Bucketed in Python like update_rollups, so a rebuild normalizes spellings the same way
+    cursor = conn.execute(f"SELECT {', '.join(PREDICTION_COLUMNS)} FROM predictions {where}", params)
+    totals = {}
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        _fold(totals, rows, lookups)
+    conn.executemany(UPSERT_ROLLUP, [(*key, *total) for key, total in totals.items()])
+
+
+def _summarize(n, approved, probability_sum, histogram):
+    return {
+        "n": n,
+        "approved": approved,
+        "approval_rate": approved / n if n else None,
+        "mean_probability": probability_sum / n if n else None,
+        "histogram": list(histogram),
+    }
+
+
+def _day_range(where, params, start, end):
+    if start is not None:
+        where.append("bucket>=?")
+        params.append(start)
+    if end is not None:
+        where.append("bucket<=?")
+        params.append(end)
+
+
+def read_rollups(db, user_id, dimension, start=None, end=None):
+    """Per-bucket stats for one dimension; start/end bound day buckets (inclusive)"""
+    where, params = ["user_id=?", "dimension=?"], [user_id, dimension]
+    if dimension == "day":
+        _day_range(where, params, start, end)
+    rows = db.execute(
+        f"SELECT bucket, n, approved, probability_sum, {', '.join(HISTOGRAM_COLUMNS)} "
+        f"FROM prediction_rollups WHERE {' AND '.join(where)} ORDER BY bucket",
+        params,
+    ).fetchall()
+    return [{"bucket": row[0], **_summarize(row[1], row[2], row[3], row[4:])} for row in rows]
+
+
+def read_summary(db, user_id, start=None, end=None):
+    """Portfolio totals, summed over the user's day buckets"""
+    where, params = ["user_id=?", "dimension='day'"], [user_id]
+    _day_range(where, params, start, end)
+    row = db.execute(
+        f"SELECT {', '.join(f'COALESCE(SUM({col}), 0)' for col in ROLLUP_COLUMNS[3:])} "
+        f"FROM prediction_rollups WHERE {' AND '.join(where)}",
+        params,
+    ).fetchone()
+    return _summarize(row[0], row[1], row[2], row[3:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain prediction rollups")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute rollups from predictions")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--model-dir", default=DEFAULT_ARTIFACT_DIR,
+                        help="Artifacts whose label encoders define the grade and purpose buckets")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("Nothing to do (use --rebuild)")
+
+    lookups = compile_lookups(joblib.load(os.path.join(args.model_dir, "label_encoders.pkl")))
+    conn = Database(args.db).conn
+    # Take the write lock up front so no insert lands between delete and re-insert
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        create_rollup_table(conn)
+        rebuild_rollups(conn, args.user_id, lookups)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"Rebuilt prediction rollups for {scope}")
+
+
+if __name__ == "__main__":
+    main()
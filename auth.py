@@ -3,36 +3,50 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from database import get_db, User
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from database import get_async_db, User
+from cache import TokenCache
+from hashing import password_hasher
+import os
 import secrets
 import hashlib
+import time
 
 # Security Configuration
 SECRET_KEY = secrets.token_urlsafe(32)  # Generate a secure secret key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 RESET_TOKEN_EXPIRE_MINUTES = 60
+# Verified tokens -> user snapshots, so repeat requests skip the JWT check and user query (0 = off)
+TOKEN_CACHE_SIZE = int(os.getenv("LOAN_TOKEN_CACHE_SIZE", "1000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("LOAN_TOKEN_CACHE_TTL_SECONDS", "60"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (bcrypt cost from LOAN_BCRYPT_ROUNDS; see hashing.py)
+pwd_context = password_hasher.context
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS) if TOKEN_CACHE_SIZE > 0 else None
+
 # Password utilities
+def _prehash(password: str) -> str:
+    # Hash with SHA-256 first to handle any password length
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    # Hash with SHA-256 first to handle any password length
-    password_hash = hashlib.sha256(plain_password.encode('utf-8')).hexdigest()
-    return pwd_context.verify(password_hash, hashed_password)
+    return pwd_context.verify(_prehash(plain_password), hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    # Hash with SHA-256 first to handle any password length
-    password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
-    return pwd_context.hash(password_hash)
+    return pwd_context.hash(_prehash(password))
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hasher's pool, off the event loop"""
+    return await password_hasher.hash(_prehash(password))
 
 # Token utilities
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -55,33 +69,38 @@ def generate_reset_token() -> str:
     """Generate a password reset token (alias for create_reset_token)"""
     return secrets.token_urlsafe(32)
 
-# User authentication
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+# User authentication (async sessions from database.get_async_db; bcrypt on the password hasher)
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """Authenticate a user by username/email and password"""
     # Try to find user by username first
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_by_username(db, username)
     
     # If not found, try to find by email
     if not user:
-        user = db.query(User).filter(User.email == username).first()
+        user = await get_user_by_email(db, username)
     
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(_prehash(password), user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Stored with a different bcrypt cost: upgrade it
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email"""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).where(User.email == email))
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get user by username"""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).where(User.username == username))
 
-def create_user(db: Session, email: str, username: str, password: str, full_name: Optional[str] = None) -> User:
+async def create_user(db: AsyncSession, email: str, username: str, password: str, full_name: Optional[str] = None) -> User:
     """Create a new user"""
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     db_user = User(
         email=email,
         username=username,
@@ -91,14 +110,30 @@ def create_user(db: Session, email: str, username: str, password: str, full_name
         is_verified=False
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
+# Token cache utilities
+def _user_snapshot(user: User) -> dict:
+    """Column values of a user, safe to share between requests"""
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+async def _user_from_snapshot(db: AsyncSession, snapshot: dict) -> User:
+    """Attach a cached user to this request's session without querying"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+def invalidate_user_tokens(username: str) -> None:
+    """Forget cached tokens for a user so the next request re-reads it"""
+    if token_cache is not None:
+        token_cache.invalidate_user(username)
+
 # Current user dependency
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Get the current authenticated user from JWT token"""
     credentials_exception = HTTPException(
@@ -107,6 +142,11 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    if token_cache is not None:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return await _user_from_snapshot(db, cached[1])
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -115,10 +155,13 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_username(db, username=username)
+    user = await get_user_by_username(db, username=username)
     if user is None:
         raise credentials_exception
     
+    if token_cache is not None:
+        expires_at = payload.get("exp", time.time() + TOKEN_CACHE_TTL_SECONDS)
+        token_cache.put_token(token, username, _user_snapshot(user), expires_at)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -128,17 +171,17 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 # Password reset utilities
-def set_reset_token(db: Session, user: User) -> str:
+async def set_reset_token(db: AsyncSession, user: User) -> str:
     """Generate and set a password reset token for a user"""
     reset_token = create_reset_token()
     user.reset_token = reset_token
     user.reset_token_expiry = datetime.utcnow() + timedelta(minutes=RESET_TOKEN_EXPIRE_MINUTES)
-    db.commit()
+    await db.commit()
     return reset_token
 
-def verify_reset_token(db: Session, token: str) -> Optional[User]:
+async def verify_reset_token(db: AsyncSession, token: str) -> Optional[User]:
     """Verify a password reset token and return the user"""
-    user = db.query(User).filter(User.reset_token == token).first()
+    user = await db.scalar(select(User).where(User.reset_token == token))
     
     if not user:
         return None
@@ -147,15 +190,22 @@ def verify_reset_token(db: Session, token: str) -> Optional[User]:
         # Token expired
         user.reset_token = None
         user.reset_token_expiry = None
-        db.commit()
+        await db.commit()
         return None
     
     return user
 
-def reset_password(db: Session, user: User, new_password: str) -> bool:
+async def reset_password(db: AsyncSession, user: User, new_password: str) -> bool:
     """Reset a user's password"""
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash_async(new_password)
     user.reset_token = None
     user.reset_token_expiry = None
-    db.commit()
-    return True
\ No newline at end of file
+    await db.commit()
+    invalidate_user_tokens(user.username)
+    return True
+
+async def deactivate_user(db: AsyncSession, user: User) -> None:
+    """Deactivate a user; cached tokens stop authenticating them immediately"""
+    user.is_active = False
+    await db.commit()
+    invalidate_user_tokens(user.username)
\ No newline at end of file
@@ -1,18 +1,56 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile
+from fastapi import FastAPI, HTTPException, Depends, File, Header, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import sqlite3
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+import numpy as np
+import asyncio
+import os
+import time
 import uuid
+from pathlib import Path
+from registry import BATCH_TIER, DECISION_THRESHOLD, DEFAULT_TIER, registry
+from auth import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS
+from cache import TokenCache
+from hashing import HasherBusyError, password_hasher
+from storage import (Database, PredictionWriter, PREDICTION_COLUMNS, create_prediction_table, decode_cursor,
+                     encode_cursor, fetch_predictions)
+from export import EXPORT_FORMATS, EXPORT_MEDIA_TYPES, parquet_available, stream_export
+from analytics import DIMENSIONS, create_rollup_table, read_rollups, read_summary, rebuild_rollups, update_rollups
+from jobs import BatchJobManager
+from inference_pool import InferenceExecutor, QueueFullError
+from microbatch import MicroBatcher
+from metrics import STAGE_SECONDS, MetricsMiddleware, metrics
+from decision_log import decision_log
 
 # --- Config ---
 SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
+BATCH_CHUNK_ROWS = int(os.getenv("LOAN_BATCH_CHUNK_ROWS", "5000"))
+JOBS_DIR = os.getenv("LOAN_JOBS_DIR", "batch_jobs")
+JOB_WORKERS = int(os.getenv("LOAN_JOB_WORKERS", "2"))
+# Finished batch jobs and their result files are deleted after this long (0 = keep forever)
+JOB_RETENTION_HOURS = float(os.getenv("LOAN_JOB_RETENTION_HOURS", "24"))
+# Scoring worker processes (0 = score on a thread pool in this process)
+INFERENCE_WORKERS = int(os.getenv("LOAN_INFERENCE_WORKERS", "0"))
+INFERENCE_MAX_PENDING = int(os.getenv("LOAN_INFERENCE_MAX_PENDING", "64"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("LOAN_INFERENCE_TIMEOUT_SECONDS", "10"))
+# Coalesce concurrent /predict/single calls for up to this long (0 = off)
+MICROBATCH_WAIT_MS = float(os.getenv("LOAN_MICROBATCH_WAIT_MS", "0"))
+MICROBATCH_MAX_ROWS = int(os.getenv("LOAN_MICROBATCH_MAX_ROWS", "64"))
+# Usernames allowed to call admin routes such as /model/reload (none = those routes are closed)
+ADMIN_USERS = {name.strip() for name in os.getenv("LOAN_ADMIN_USERS", "").split(",") if name.strip()}
+# /model/reload only loads artifact sets from directories under this root (train.py's --output-dir)
+MODEL_BUNDLE_ROOT = Path(os.getenv("LOAN_MODEL_BUNDLE_ROOT", "artifacts")).resolve()
 
 # --- Setup FastAPI ---
 app = FastAPI()
@@ -23,16 +61,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request latency covers the whole stack
+app.add_middleware(MetricsMiddleware)
 
 # --- Password hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on the hasher's own bounded pool (LOAN_BCRYPT_ROUNDS, LOAN_HASH_WORKERS)
+pwd_context = password_hasher.context
 
 # --- Database setup ---
-conn = sqlite3.connect("loan_db.sqlite3", check_same_thread=False)
-cursor = conn.cursor()
+# One WAL-mode connection per thread; prediction history goes through the writer thread
+db = Database()
 
 # Users
-cursor.execute("""
+db.execute("""
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE,
@@ -42,29 +83,18 @@ CREATE TABLE IF NOT EXISTS users (
 """)
 
 # Predictions history
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS predictions (
-    id TEXT PRIMARY KEY,
-    user_id INTEGER,
-    name TEXT,
-    annual_income REAL,
-    debt_to_income_ratio REAL,
-    credit_score REAL,
-    loan_amount REAL,
-    interest_rate REAL,
-    gender TEXT,
-    marital_status TEXT,
-    education_level TEXT,
-    employment_status TEXT,
-    loan_purpose TEXT,
-    grade_subgrade TEXT,
-    prediction_type TEXT,
-    prediction INTEGER,
-    probability REAL,
-    created_at TEXT
-)
-""")
-conn.commit()
+create_prediction_table(db.conn)
+
+# Dashboard rollups, kept current by the writer in the same transaction as each insert
+rollups_existed = db.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='prediction_rollups'").fetchone()
+create_rollup_table(db.conn)
+db.conn.commit()
+
+def fold_rollups(conn, rows):
+    # Grade and purpose buckets are the serving model's encoder classes
+    update_rollups(conn, rows, registry.get().categorical_lookups)
+
+prediction_writer = PredictionWriter(db, after_insert=fold_rollups)
 
 # --- Pydantic models ---
 class UserRegister(BaseModel):
@@ -76,6 +106,10 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+class ModelReload(BaseModel):
+    # Bundle directory relative to MODEL_BUNDLE_ROOT, e.g. a train.py version; None reloads the current one
+    artifact_dir: Optional[str] = None
+
 class SinglePrediction(BaseModel):
     name: str
     annual_income: float
@@ -103,13 +137,16 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(lambda: None)):
-    from fastapi import Header
-    authorization: str = token
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS) if TOKEN_CACHE_SIZE > 0 else None
+
+def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    if authorization.startswith("Bearer "):
-        token = authorization[7:]
+    token = authorization[7:] if authorization.startswith("Bearer ") else authorization
+    if token_cache is not None:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached[1]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -118,31 +155,165 @@ def get_current_user(token: str = Depends(lambda: None)):
     except JWTError:
         raise HTTPException(status_code=401, detail="Unauthorized")
     
-    cursor.execute("SELECT * FROM users WHERE username=?", (username,))
-    user = cursor.fetchone()
+    user = db.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    if token_cache is not None:
+        token_cache.put_token(token, username, user, payload.get("exp", time.time() + TOKEN_CACHE_TTL_SECONDS))
     return user
 
+def get_admin_user(current_user=Depends(get_current_user)):
+    if current_user[1] not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+def invalidate_user_tokens(username):
+    """Forget cached tokens for username; call after changing the user's password or access"""
+    if token_cache is not None:
+        token_cache.invalidate_user(username)
+
+# --- Batch scoring ---
+# Input columns stored with each prediction, in table order
+PREDICTION_INPUT_COLUMNS = [
+    "annual_income", "debt_to_income_ratio", "credit_score", "loan_amount", "interest_rate",
+    "gender", "marital_status", "education_level", "employment_status", "loan_purpose",
+    "grade_subgrade",
+]
+
+def score_csv_chunks(fileobj, user_id, predictor, chunk_rows=BATCH_CHUNK_ROWS, prediction_type="batch"):
+    """
+    Score a CSV file chunk by chunk: each chunk is encoded and scored in one
+    vectorized call and its valid rows are stored with one executemany in
+    one writer commit. Yields the chunk's results once they are stored; row
+    numbers are 0-based positions in the file.
+    """
+    offset = 0
+    for chunk in pd.read_csv(fileobj, chunksize=chunk_rows):
+        predictions, probabilities, errors = predictor.predict_many(chunk)
+        valid = np.ones(len(chunk), dtype=bool)
+        valid[list(errors)] = False
+        n_valid = int(valid.sum())
+
+        ids = [str(uuid.uuid4()) for _ in range(n_valid)]
+        names = chunk["name"][valid].tolist() if "name" in chunk else [None] * n_valid
+        # Missing input columns come through as NaN; their rows already failed validation
+        inputs = [column[valid].tolist() for _, column in chunk.reindex(columns=PREDICTION_INPUT_COLUMNS).items()]
+        created_at = datetime.utcnow().isoformat()
+        rows = zip(ids, [user_id] * n_valid, names, *inputs, [prediction_type] * n_valid,
+                   predictions[valid].tolist(), probabilities[valid].tolist(), [created_at] * n_valid)
+        prediction_writer.write(rows)
+
+        yield {
+            "count": n_valid,
+            "failed": len(errors),
+            "rows": np.arange(offset, offset + len(chunk)),
+            "valid": valid,
+            "ids": ids,
+            "predictions": predictions,
+            "probabilities": probabilities,
+            "errors": {offset + row: message for row, message in errors.items()},
+        }
+        offset += len(chunk)
+
+batch_jobs = BatchJobManager(db, score_csv_chunks, JOBS_DIR, max_workers=JOB_WORKERS,
+                             retention_seconds=JOB_RETENTION_HOURS * 3600)
+
+inference = InferenceExecutor(registry, workers=INFERENCE_WORKERS, max_pending=INFERENCE_MAX_PENDING,
+                              timeout=INFERENCE_TIMEOUT_SECONDS)
+batcher = None
+if MICROBATCH_WAIT_MS > 0:
+    batcher = MicroBatcher(inference.predict_many, MICROBATCH_WAIT_MS, MICROBATCH_MAX_ROWS)
+
+# --- Metrics ---
+def _cache_stat(cache, key):
+    return None if cache is None else getattr(cache, key)
+
+metrics.callback("loan_queue_depth", "Requests (or rows, for microbatch) waiting in each queue",
+                 lambda: inference.pending, {"queue": "inference"})
+metrics.callback("loan_queue_depth", "", lambda: prediction_writer.stats()["queued"], {"queue": "db_writer"})
+metrics.callback("loan_queue_depth", "", lambda: password_hasher.pending, {"queue": "password_hasher"})
+if batcher is not None:
+    metrics.callback("loan_queue_depth", "", lambda: batcher.pending_rows, {"queue": "microbatch"})
+metrics.callback("loan_decision_log_dropped_total", "Decision log records dropped because the queue was full",
+                 lambda: decision_log.dropped, kind="counter")
+for key in ("hits", "misses"):
+    metrics.callback(f"loan_cache_{key}_total", f"Cache {key} (score counts reset when a new model is loaded)",
+                     lambda key=key: _cache_stat(registry.get().score_cache, key), {"cache": "score"}, kind="counter")
+    metrics.callback(f"loan_cache_{key}_total", "", lambda key=key: _cache_stat(token_cache, key),
+                     {"cache": "token"}, kind="counter")
+
+async def run_scoring(call, *args, **kwargs):
+    """Await a scoring call on the inference executor, mapping overload and timeouts to HTTP errors"""
+    try:
+        return await call(*args, **kwargs)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Scoring is at capacity, retry shortly",
+                            headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Scoring timed out")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def run_hashing(call, *args):
+    """Await a bcrypt call on the password hasher, shedding load when it is saturated"""
+    try:
+        return await call(*args)
+    except HasherBusyError:
+        raise HTTPException(status_code=503, detail="Too many logins in progress, retry shortly",
+                            headers={"Retry-After": "1"})
+
+# --- Model lifecycle ---
+@app.on_event("startup")
+def load_model():
+    # Load and warm the model before the first request instead of on it
+    registry.get().load()
+    registry.get(tier=BATCH_TIER).load()
+    inference.warm()
+    if not rollups_existed:
+        # First start with rollups: backfill them from the existing history
+        prediction_writer.call(lambda conn: rebuild_rollups(conn, lookups=registry.get().categorical_lookups))
+    watch_seconds = float(os.getenv("LOAN_MODEL_WATCH_SECONDS", "0"))
+    if watch_seconds > 0:
+        registry.watch(watch_seconds)
+
+@app.on_event("shutdown")
+def stop_inference():
+    inference.shutdown()
+    password_hasher.shutdown()
+    prediction_writer.close()
+    decision_log.close()
+
 # --- Routes ---
+def insert_user(username, email, hashed):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", (username, email, hashed))
+
+def update_password_hash(user_id, hashed):
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET password=? WHERE id=?", (hashed, user_id))
+
 @app.post("/register")
-def register(user: UserRegister):
-    hashed = get_password_hash(user.password)
+async def register(user: UserRegister):
+    hashed = await run_hashing(password_hasher.hash, user.password)
     try:
-        cursor.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-                       (user.username, user.email, hashed))
-        conn.commit()
+        await run_in_threadpool(insert_user, user.username, user.email, hashed)
         access_token = create_access_token({"sub": user.username})
         return {"access_token": access_token, "token_type": "bearer"}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Username already exists")
 
 @app.post("/login")
-def login(user: UserLogin):
-    cursor.execute("SELECT * FROM users WHERE username=?", (user.username,))
-    db_user = cursor.fetchone()
-    if not db_user or not verify_password(user.password, db_user[3]):
+async def login(user: UserLogin):
+    db_user = await run_in_threadpool(
+        lambda: db.execute("SELECT * FROM users WHERE username=?", (user.username,)).fetchone())
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await run_hashing(password_hasher.verify_and_update, user.password, db_user[3])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored with a different bcrypt cost: upgrade it now that we have the password
+        await run_in_threadpool(update_password_hash, db_user[0], new_hash)
     access_token = create_access_token({"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -150,49 +321,206 @@ def login(user: UserLogin):
 def auth_me(current_user=Depends(get_current_user)):
     return {"username": current_user[1], "email": current_user[2]}
 
-@app.post("/predict/single")
-def predict_single(pred: SinglePrediction, current_user=Depends(get_current_user)):
-    # Dummy ML logic: approve if credit_score > 650 and DTI < 0.4
-    probability = min(max((pred.credit_score - 600)/200 * (0.4 - pred.debt_to_income_ratio), 0), 1)
-    prediction = 1 if probability >= 0.5 else 0
-    
-    pred_id = str(uuid.uuid4())
-    cursor.execute("""
-    INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        pred_id, current_user[0], pred.name, pred.annual_income, pred.debt_to_income_ratio,
+def save_single_prediction(pred: SinglePrediction, user_id, prediction, probability, pred_id=None):
+    pred_id = pred_id or str(uuid.uuid4())
+    prediction_writer.write([(
+        pred_id, user_id, pred.name, pred.annual_income, pred.debt_to_income_ratio,
         pred.credit_score, pred.loan_amount, pred.interest_rate, pred.gender,
         pred.marital_status, pred.education_level, pred.employment_status,
         pred.loan_purpose, pred.grade_subgrade, "single", prediction, probability,
         datetime.utcnow().isoformat()
-    ))
-    conn.commit()
-    return {"id": pred_id, "prediction": prediction, "probability": probability}
+    )])
+    return pred_id
+
+@app.post("/predict/single")
+async def predict_single(request: Request, pred: SinglePrediction, explain: bool = False,
+                         current_user=Depends(get_current_user)):
+    received_at = getattr(request.state, "received_at", None)
+    if received_at is not None:
+        STAGE_SECONDS["parse"].observe_since(received_at)
+    # The decision log is keyed by the caller's X-Request-ID, or else the prediction id
+    pred_id = str(uuid.uuid4())
+    request_id = request.headers.get("x-request-id") or pred_id
+    # Scoring runs on the inference executor and the insert on the thread
+    # pool, so neither holds up the event loop. ?explain=true skips the
+    # micro-batcher and adds per-feature contributions and reason codes
+    if explain:
+        prediction, probability, model_version, explanation = await run_scoring(
+            inference.predict_single, pred.dict(exclude={"name"}), request_id=request_id, explain=True)
+    else:
+        score = batcher.submit if batcher is not None else inference.predict_single
+        prediction, probability, model_version = await run_scoring(score, pred.dict(exclude={"name"}),
+                                                                   request_id=request_id)
+    await run_in_threadpool(save_single_prediction, pred, current_user[0], prediction, probability, pred_id)
+    started = time.perf_counter()
+    body = {"id": pred_id, "prediction": prediction, "probability": probability, "model_version": model_version,
+            "model_tier": DEFAULT_TIER, "decision_threshold": DECISION_THRESHOLD}
+    if explain:
+        body["explanation"] = explanation
+    response = JSONResponse(body, headers={"X-Request-ID": request_id})
+    STAGE_SECONDS["serialize"].observe_since(started)
+    return response
 
 @app.post("/predict_batch")
 def predict_batch(file: UploadFile = File(...), current_user=Depends(get_current_user)):
-    df = pd.read_csv(file.file)
-    results = []
-    for _, row in df.iterrows():
-        prob = min(max((row['credit_score'] - 600)/200 * (0.4 - row['debt_to_income_ratio']), 0), 1)
-        pred_val = 1 if prob >= 0.5 else 0
-        pred_id = str(uuid.uuid4())
-        results.append({"id": pred_id, "prediction": pred_val, "probability": prob})
-        cursor.execute("""
-        INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            pred_id, current_user[0], row['name'], row['annual_income'], row['debt_to_income_ratio'],
-            row['credit_score'], row['loan_amount'], row['interest_rate'], row['gender'],
-            row['marital_status'], row['education_level'], row['employment_status'],
-            row['loan_purpose'], row['grade_subgrade'], "batch", pred_val, prob,
-            datetime.utcnow().isoformat()
-        ))
-    conn.commit()
-    return {"count": len(results), "batch_id": str(uuid.uuid4())}
+    # Scored in this request but recorded as a job, so the batch_id can be
+    # looked up and its per-row results fetched from /jobs afterwards.
+    # Batches score on the batch tier, interactive requests on the default one
+    predictor = registry.get(tier=BATCH_TIER)
+    started = time.perf_counter()
+    job = batch_jobs.run(file.file, file.filename, current_user[0], predictor)
+    elapsed = time.perf_counter() - started
+    if job["status"] == "failed":
+        # Unreadable file or scoring error; the job record keeps it for /jobs/{batch_id} too
+        raise HTTPException(status_code=400, detail=job["error"])
+    rows = job["rows_done"] + job["rows_failed"]
+    return {"count": job["rows_done"], "failed": job["rows_failed"], "batch_id": job["id"],
+            "status": job["status"], "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+            "model_version": job["model_version"] or predictor.version,
+            "model_tier": job["model_tier"] or predictor.tier, "decision_threshold": predictor.decision_threshold}
+
+@app.post("/jobs/batch", status_code=202)
+def submit_batch_job(file: UploadFile = File(...), current_user=Depends(get_current_user)):
+    predictor = registry.get(tier=BATCH_TIER)
+    job_id = batch_jobs.submit(file.file, file.filename, current_user[0], predictor)
+    return {"job_id": job_id, "status": "queued", "model_tier": predictor.tier}
+
+@app.get("/jobs/{job_id}")
+def get_batch_job(job_id: str, current_user=Depends(get_current_user)):
+    job = batch_jobs.get(job_id, current_user[0])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/results")
+def get_batch_job_results(job_id: str, format: str = "csv", current_user=Depends(get_current_user)):
+    if format not in ("csv", "json"):
+        raise HTTPException(status_code=400, detail="format must be csv or json")
+    job = batch_jobs.get(job_id, current_user[0])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    media_type = "text/csv" if format == "csv" else "application/json"
+    return StreamingResponse(
+        batch_jobs.iter_results(job_id, format), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{job_id}.{format}"'},
+    )
+
+@app.get("/analytics/summary")
+def analytics_summary(start: Optional[date] = None, end: Optional[date] = None,
+                      current_user=Depends(get_current_user)):
+    # Totals over the day rollups; start/end are inclusive UTC dates
+    return read_summary(db, current_user[0], start.isoformat() if start else None,
+                        end.isoformat() if end else None)
+
+@app.get("/analytics/{dimension}")
+def analytics_breakdown(dimension: str, start: Optional[date] = None, end: Optional[date] = None,
+                        current_user=Depends(get_current_user)):
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown dimension. Expected one of: {list(DIMENSIONS)}")
+    return {"dimension": dimension,
+            "buckets": read_rollups(db, current_user[0], dimension, start.isoformat() if start else None,
+                                    end.isoformat() if end else None)}
+
+@app.post("/analytics/rebuild")
+def analytics_rebuild(current_user=Depends(get_current_user)):
+    # Runs on the writer thread, so no insert can land mid-rebuild
+    prediction_writer.call(lambda conn: rebuild_rollups(conn, current_user[0], registry.get().categorical_lookups))
+    return {"status": "rebuilt"}
+
+@app.get("/model/status")
+def model_status(current_user=Depends(get_current_user)):
+    status = registry.status()
+    status["inference"] = {"workers": inference.workers, "pending": inference.pending,
+                           "max_pending": inference.max_pending}
+    if batcher is not None:
+        status["microbatch"] = batcher.stats()
+    status["storage"] = prediction_writer.stats()
+    status["decision_log"] = decision_log.stats()
+    return status
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # Prometheus text exposition format; no user data, so no auth for scrapers
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def bundle_dir(name):
+    """Resolve a client-supplied bundle name under MODEL_BUNDLE_ROOT, refusing anything outside it"""
+    path = (MODEL_BUNDLE_ROOT / name).resolve()
+    if path == MODEL_BUNDLE_ROOT or not path.is_relative_to(MODEL_BUNDLE_ROOT):
+        raise HTTPException(status_code=400, detail="artifact_dir must name a bundle under the model bundle root")
+    if not path.is_dir():
+        raise HTTPException(status_code=404, detail="No such model bundle")
+    return str(path)
+
+@app.post("/model/reload")
+def model_reload(body: ModelReload, current_user=Depends(get_admin_user)):
+    # Artifacts are unpickled, so only admins may reload and only from the bundle root.
+    # Loads, validates and warms the new artifacts in the background; the
+    # current model keeps serving until the swap
+    artifact_dir = bundle_dir(body.artifact_dir) if body.artifact_dir else None
+    registry.reload(artifact_dir)
+    return {"status": "reloading", "artifact_dir": artifact_dir or registry.artifact_dir}
+
+def utc_iso(value: Optional[datetime]):
+    """created_at is stored as naive UTC ISO text; convert filter bounds to match"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+def history_filters(cursor, start, end, decision):
+    """Validate the history/export query filters into fetch_predictions arguments"""
+    if decision not in (None, "approved", "rejected"):
+        raise HTTPException(status_code=400, detail="decision must be approved or rejected")
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return {"after": cursor, "start": utc_iso(start), "end": utc_iso(end),
+            "prediction": None if decision is None else int(decision == "approved")}
 
 @app.get("/predictions/history")
-def get_history(current_user=Depends(get_current_user)):
-    cursor.execute("SELECT * FROM predictions WHERE user_id=? ORDER BY created_at DESC", (current_user[0],))
-    rows = cursor.fetchall()
-    keys = [description[0] for description in cursor.description]
-    return [dict(zip(keys, r)) for r in rows]
+def get_history(limit: int = HISTORY_DEFAULT_LIMIT, cursor: Optional[str] = None, fields: Optional[str] = None,
+                start: Optional[datetime] = None, end: Optional[datetime] = None,
+                decision: Optional[str] = None, current_user=Depends(get_current_user)):
+    # Pages newest first; pass next_cursor back as cursor for the next page
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {HISTORY_MAX_LIMIT}")
+    columns = PREDICTION_COLUMNS
+    if fields:
+        columns = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in columns if field not in PREDICTION_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}. Expected any of: {PREDICTION_COLUMNS}")
+    filters = history_filters(cursor, start, end, decision)
+    rows, next_cursor = fetch_predictions(db, current_user[0], columns, limit, **filters)
+    return {"items": [dict(zip(columns, row)) for row in rows], "next_cursor": next_cursor}
+
+@app.get("/predictions/export")
+def export_predictions(format: str = "ndjson", cursor: Optional[str] = None,
+                       after_created_at: Optional[str] = None, after_id: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       decision: Optional[str] = None, current_user=Depends(get_current_user)):
+    # Streams every matching row, newest first, page by page. An interrupted
+    # export resumes after the last complete row received: pass its created_at
+    # and id (both columns of every format) as after_created_at and after_id
+    if (after_created_at is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_created_at and after_id must be passed together")
+    if after_id is not None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Pass either cursor or after_created_at/after_id")
+        cursor = encode_cursor(after_created_at, after_id)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export is not available on this server")
+    filters = history_filters(cursor, start, end, decision)
+    return StreamingResponse(
+        stream_export(db, current_user[0], format, **filters), media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="predictions.{format}"'},
+    )
@@ -0,0 +1,326 @@
+"""
+Inference micro-benchmarks on synthetic applicants.
+
+    python bench.py --output bench.json
+    python bench.py --baseline bench.json --tolerance 0.25 --output run.json
+
+Times each stage of scoring at every batch size: normalize (categorical
+values -> encoder codes), encode (request records -> feature matrix),
+scale, forest, explain (the per-feature contributions ?explain=true adds)
+and persist (PredictionWriter into a scratch SQLite file), plus
+predict_many end to end and predict_single called once per row. Results go to JSON; with
+--baseline the run exits 1 when any stage's median is slower than the
+baseline by more than the tolerance. A baseline taken with another engine,
+tier, model version or durability mode is refused unless
+--allow-baseline-mismatch is given.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from analytics import create_rollup_table, update_rollups
+from decision_log import decision_log
+from model import LoanPredictor, ENGINES, TIERS, FEATURE_ORDER, NUMERIC_COLS
+from registry import DEFAULT_ARTIFACT_DIR
+from schemas import SinglePredictionRequest
+from storage import Database, PredictionWriter, DURABILITY_MODES, create_prediction_table
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 100000)
+STAGES = ("normalize", "encode", "scale", "forest", "explain", "persist", "predict_many", "predict_single")
+# predict_single is one call per row, so it only runs up to this batch size
+SINGLE_MAX_ROWS = 1000
+DEFAULT_TOLERANCE = 0.25
+# Slowdowns smaller than this are timer noise rather than regressions
+MIN_DELTA_MS = 0.05
+# Run settings a baseline must share for its timings to be comparable
+BASELINE_KEYS = ("engine", "tier", "model_version", "durability")
+
+
+def schema_bounds():
+    """(low, high, integer) per numeric column, from SinglePredictionRequest's constraints"""
+    bounds = {}
+    for col in NUMERIC_COLS:
+        field = SinglePredictionRequest.model_fields[col]
+        low, high = -np.inf, np.inf
+        for constraint in field.metadata:
+            if getattr(constraint, "ge", None) is not None:
+                low = constraint.ge
+            if getattr(constraint, "gt", None) is not None:
+                low = np.nextafter(constraint.gt, np.inf)
+            if getattr(constraint, "le", None) is not None:
+                high = constraint.le
+            if getattr(constraint, "lt", None) is not None:
+                high = np.nextafter(constraint.lt, -np.inf)
+        bounds[col] = (low, high, field.annotation is int)
+    return bounds
+
+
+def _respell(value, style):
+    return (value.upper(), value.lower(), f"  {value} ")[style]
+
+
+def synthetic_applicants(predictor, n_rows, seed=0, messy=0.1):
+    """
+    Request-style applicant dicts. Numeric fields follow the training
+    distribution (the scaler's mean and scale) clipped to the API's
+    validation ranges; categorical fields are drawn from the encoder
+    classes, with a messy fraction in other spellings as upstream systems
+    send them.
+    """
+    if not predictor._loaded:
+        predictor.load()
+    rng = np.random.default_rng(seed)
+    bounds = schema_bounds()
+    columns = {}
+    for idx, col in enumerate(FEATURE_ORDER):
+        if col in NUMERIC_COLS:
+            low, high, integer = bounds[col]
+            values = np.clip(rng.normal(predictor.scaler.mean_[idx], predictor.scaler.scale_[idx], n_rows), low, high)
+            columns[col] = np.round(values) if integer else values
+        else:
+            classes = np.asarray(predictor.categorical_lookups[col].classes, dtype=object)
+            values = classes[rng.integers(0, len(classes), n_rows)]
+            for row in np.flatnonzero(rng.random(n_rows) < messy):
+                if isinstance(values[row], str):
+                    values[row] = _respell(values[row], rng.integers(3))
+            columns[col] = values
+    names = [f"Applicant {i}" for i in range(n_rows)]
+    return pd.DataFrame({"name": names, **columns}).to_dict(orient="records")
+
+
+def measure(fn, min_time=0.2, max_repeats=50):
+    """Seconds per call of fn: one warm-up, then at least 3 calls and until min_time has passed"""
+    fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < 3 or (time.perf_counter() - start < min_time and len(times) < max_repeats):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def _summarize(stage, n_rows, times):
+    times_ms = sorted(t * 1000 for t in times)
+    median = statistics.median(times_ms)
+    return {
+        "stage": stage,
+        "batch_size": n_rows,
+        "repeats": len(times_ms),
+        "median_ms": round(median, 4),
+        "p95_ms": round(times_ms[min(len(times_ms) - 1, int(len(times_ms) * 0.95))], 4),
+        "min_ms": round(times_ms[0], 4),
+        "per_row_us": round(median * 1000 / n_rows, 4),
+    }
+
+
+class _Persister:
+    """Scored rows -> PredictionWriter on a scratch database, as backend stores them"""
+
+    def __init__(self, path, durability, lookups=None):
+        self.db = Database(path)
+        create_prediction_table(self.db.conn)
+        create_rollup_table(self.db.conn)
+        self.db.conn.commit()
+        self.writer = PredictionWriter(self.db, durability=durability,
+                                       after_insert=lambda conn, rows: update_rollups(conn, rows, lookups))
+        self.calls = 0
+
+    def rows(self, records, predictions, probabilities):
+        created_at = datetime.utcnow().isoformat()
+        return [
+            (None, 1, record["name"], *(record[col] for col in FEATURE_ORDER), "bench",
+             int(prediction), float(probability), created_at)
+            for record, prediction, probability in zip(records, predictions, probabilities)
+        ]
+
+    def write(self, rows):
+        # Fresh primary keys on every call
+        self.calls += 1
+        self.writer.write((f"{self.calls}-{i}", *row[1:]) for i, row in enumerate(rows))
+
+    def close(self):
+        self.writer.close()
+
+
+def run(predictor, sizes, stages, persister, seed=0, min_time=0.2, max_repeats=50, log=print):
+    results = []
+    for n_rows in sizes:
+        records = synthetic_applicants(predictor, n_rows, seed=seed)
+        frame = predictor._batch_to_frame(records)
+        codes = predictor._normalize_batch(frame)
+        X, errors = predictor._encode_batch(frame, codes)
+        if errors:
+            raise ValueError(f"Synthetic applicants failed validation: {next(iter(errors.values()))}")
+        scaled = predictor._transform(X)
+        predictions, probabilities = predictor._score(scaled)
+        rows = persister.rows(records, predictions, probabilities) if persister else None
+
+        timed = {
+            "normalize": lambda: predictor._normalize_batch(frame),
+            "encode": lambda: predictor._encode_batch(predictor._batch_to_frame(records), codes),
+            "scale": lambda: predictor._transform(X),
+            "forest": lambda: predictor._score(scaled),
+            "explain": lambda: predictor._explain(scaled),
+            "persist": (lambda: persister.write(rows)) if persister else None,
+            "predict_many": lambda: predictor.predict_many(records),
+        }
+        if n_rows <= SINGLE_MAX_ROWS:
+            def predict_each():
+                for record in records:
+                    predictor.predict_single(record)
+            timed["predict_single"] = predict_each
+
+        for stage in stages:
+            fn = timed.get(stage)
+            if fn is None:
+                continue
+            result = _summarize(stage, n_rows, measure(fn, min_time, max_repeats))
+            results.append(result)
+            log(f"{stage:>14} {n_rows:>7} rows  median {result['median_ms']:>10.3f} ms  "
+                f"{result['per_row_us']:>10.3f} us/row")
+    return results
+
+
+def baseline_mismatch(meta, baseline):
+    """{key: (baseline value, current value)} for each BASELINE_KEYS setting that differs"""
+    previous = baseline.get("meta", {})
+    return {key: (previous.get(key), meta[key]) for key in BASELINE_KEYS if previous.get(key) != meta[key]}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, stage_tolerance=None, min_delta_ms=MIN_DELTA_MS):
+    """Results slower than their baseline entry by more than the tolerance, with the baseline median"""
+    stage_tolerance = stage_tolerance or {}
+    previous = {(r["stage"], r["batch_size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = previous.get((result["stage"], result["batch_size"]))
+        if base is None:
+            continue
+        allowed = base["median_ms"] * (1 + stage_tolerance.get(result["stage"], tolerance))
+        if result["median_ms"] > allowed and result["median_ms"] - base["median_ms"] > min_delta_ms:
+            regressions.append({**result, "baseline_median_ms": base["median_ms"],
+                                "change": round(result["median_ms"] / base["median_ms"] - 1, 4)})
+    return regressions
+
+
+def _parse_sizes(text):
+    return [int(size) for size in text.split(",") if size]
+
+
+def _parse_stage_tolerance(text):
+    stage, _, value = text.partition("=")
+    if stage not in STAGES or not value:
+        raise argparse.ArgumentTypeError(f"Expected <stage>=<fraction> with stage one of {list(STAGES)}")
+    return stage, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scoring pipeline stage by stage")
+    parser.add_argument("--artifact-dir", default=DEFAULT_ARTIFACT_DIR)
+    parser.add_argument("--engine", choices=ENGINES, default="sklearn")
+    parser.add_argument("--tier", choices=list(TIERS), default="full")
+    parser.add_argument("--sizes", type=_parse_sizes, default=list(BATCH_SIZES),
+                        help="Comma-separated batch sizes (default 1,10,...,100000)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to keep repeating each measurement")
+    parser.add_argument("--max-repeats", type=int, default=50)
+    parser.add_argument("--durability", choices=DURABILITY_MODES, default="normal", help="For the persist stage")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--baseline", default=None, help="Fail on regressions against this results file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown as a fraction of the baseline median (0.25 = 25%%)")
+    parser.add_argument("--stage-tolerance", type=_parse_stage_tolerance, action="append", default=[],
+                        help="Per-stage override, e.g. persist=0.5 (repeatable)")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS)
+    parser.add_argument("--allow-baseline-mismatch", action="store_true",
+                        help="Compare even when the baseline ran another engine, tier, model or durability")
+    args = parser.parse_args()
+
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages {sorted(unknown)}. Expected some of: {list(STAGES)}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if decision_log.path == "-":
+        # Decisions would interleave with the report; set LOAN_DECISION_LOG to a file to include logging
+        decision_log.set_level("off")
+    with contextlib.redirect_stdout(sys.stderr):  # artifact loading chatter
+        predictor = LoanPredictor(engine=args.engine, tier=args.tier, artifact_dir=args.artifact_dir)
+    if predictor.forest is None or predictor.scaler is None:
+        parser.error(f"Could not load the model from {args.artifact_dir}")
+    mismatch = {}
+    if baseline is not None:
+        current = {"engine": args.engine, "tier": args.tier, "model_version": predictor.version,
+                   "durability": args.durability}
+        mismatch = baseline_mismatch(current, baseline)
+        details = ", ".join(f"{key} {old!r} -> {new!r}" for key, (old, new) in mismatch.items())
+        if mismatch and not args.allow_baseline_mismatch:
+            parser.error(f"Baseline {args.baseline} is not comparable with this run ({details}); "
+                         f"pass --allow-baseline-mismatch to compare anyway")
+        if mismatch:
+            print(f"WARNING: baseline {args.baseline} differs from this run ({details}); "
+                  f"regressions may not be meaningful", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        persister = (_Persister(os.path.join(scratch, "bench.sqlite3"), args.durability, predictor.categorical_lookups)
+                     if "persist" in stages else None)
+        try:
+            results = run(predictor, args.sizes, stages, persister, seed=args.seed,
+                          min_time=args.min_time, max_repeats=args.max_repeats)
+        finally:
+            if persister:
+                persister.close()
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "engine": args.engine,
+            "tier": args.tier,
+            "model_version": predictor.version,
+            "seed": args.seed,
+            "durability": args.durability,
+        },
+        "results": results,
+    }
+    regressions = []
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, dict(args.stage_tolerance), args.min_delta_ms)
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "regressions": regressions,
+                              "mismatch": {key: list(values) for key, values in mismatch.items()}}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    for r in regressions:
+        print(f"REGRESSION {r['stage']} at {r['batch_size']} rows: {r['median_ms']:.3f} ms "
+              f"vs baseline {r['baseline_median_ms']:.3f} ms ({r['change']:+.0%})")
+    if baseline is not None and not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache whose entries expire after a time-to-live"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl_seconds=None):
+        """Store value; ttl_seconds shortens this entry's lifetime below the cache TTL"""
+        ttl = self.ttl if ttl_seconds is None else min(ttl_seconds, self.ttl)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, predicate):
+        """Drop every entry whose value matches predicate; returns how many"""
+        with self._lock:
+            stale = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ScoreCache(TTLCache):
+    """
+    Scoring results cache.
+
+    LoanPredictor keys it on (model version, threshold, bytes of the encoded
+    feature row). Categorical aliases are resolved by encoding before the
+    key is built, so different spellings of one application share an entry.
+    Each predictor owns its cache, so a model reload starts from empty.
+    """
+
+
+class TokenCache(TTLCache):
+    """
+    Verified bearer tokens -> (username, user record).
+
+    An entry never outlives its token's exp claim. Anything that changes
+    what a user may do (password reset, deactivation) must call
+    invalidate_user() so the next request goes back to the database.
+    """
+
+    def put_token(self, token, username, user, expires_at):
+        """Cache a verified token; expires_at is the exp claim (epoch seconds)"""
+        self.put(token, (username, user), ttl_seconds=expires_at - time.time())
+
+    def invalidate_user(self, username):
+        return self.discard(lambda value: value[0] == username)
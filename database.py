@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Index
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -20,17 +21,45 @@ SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{D
 #     f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 # )
 
+# Same database through an asyncio driver, for async def routes and dependencies.
+# sqlite+aiosqlite:///file.db works as a local stand-in (e.g. for integration tests).
+ASYNC_DATABASE_URL = os.getenv(
+    "LOAN_ASYNC_DATABASE_URL",
+    f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# Connection pool, per engine (SQLite URLs keep SQLAlchemy's default pool)
+DB_POOL_SIZE = int(os.getenv("LOAN_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("LOAN_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("LOAN_DB_POOL_TIMEOUT", "30"))      # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("LOAN_DB_POOL_RECYCLE", "3600"))      # recycle connections after 1 hour
+
+def pool_options(url):
+    """Pool settings for create_engine / create_async_engine"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,  # Verify connections before using them
+    }
+
 # Create engine
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_recycle=3600,   # Recycle connections after 1 hour
-    echo=False           # Set to True for SQL query logging
+    echo=False,          # Set to True for SQL query logging
+    **pool_options(SQLALCHEMY_DATABASE_URL)
 )
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and sessions; objects stay readable after commit, as async code can't lazy-load
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
@@ -71,16 +100,32 @@ class Prediction(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, nullable=True)  # Optional: link to user who made prediction
 
+    # Serves per-user history newest first (InnoDB appends the primary key)
+    __table_args__ = (Index("ix_predictions_user_created", "user_id", "created_at"),)
+
 # Create all tables
 def init_db():
     """Initialize database and create all tables"""
     try:
         Base.metadata.create_all(bind=engine)
+        # create_all skips tables that already exist, so add newer indexes explicitly
+        for index in Prediction.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
         print("✓ Database tables created successfully!")
     except Exception as e:
         print(f"✗ Error creating database tables: {e}")
         raise
 
+async def init_db_async():
+    """init_db over the async engine"""
+    def create(connection):
+        Base.metadata.create_all(bind=connection)
+        for index in Prediction.__table__.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+    async with async_engine.begin() as connection:
+        await connection.run_sync(create)
+
 # Dependency to get DB session
 def get_db():
     """Dependency for getting database session"""
@@ -90,6 +135,11 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Test database connection
 def test_connection():
     """Test if database connection is working"""
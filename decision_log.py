@@ -0,0 +1,147 @@
+"""
+Structured decision log.
+
+Scoring code hands records to DecisionLogger, which only samples them and
+does a non-blocking put on a bounded queue; a background thread formats
+them as JSON lines and writes them out. When the queue is full the record
+is dropped and counted, so a slow log pipe never holds up scoring.
+
+Levels: off, error (validation failures only), info (plus every scored
+decision) and debug (plus decisions answered from the score cache).
+"""
+import hashlib
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# "-" writes to stdout, anything else is a file appended to
+DECISION_LOG_PATH = os.getenv("LOAN_DECISION_LOG", "-")
+DECISION_LOG_LEVEL = os.getenv("LOAN_DECISION_LOG_LEVEL", "info")
+# Fraction of decisions / failures that are logged
+DECISION_LOG_SAMPLE_RATE = float(os.getenv("LOAN_DECISION_LOG_SAMPLE_RATE", "1.0"))
+DECISION_LOG_ERROR_SAMPLE_RATE = float(os.getenv("LOAN_DECISION_LOG_ERROR_SAMPLE_RATE", "1.0"))
+DECISION_LOG_QUEUE_SIZE = int(os.getenv("LOAN_DECISION_LOG_QUEUE_SIZE", "10000"))
+
+LEVELS = {"debug": 10, "info": 20, "error": 40, "off": 100}
+_STOP = object()
+
+
+def inputs_hash(row):
+    """Short hash of an encoded feature row, so equivalent spellings hash alike"""
+    return hashlib.sha256(row.tobytes()).hexdigest()[:16]
+
+
+class DecisionLogger:
+    def __init__(self, path=DECISION_LOG_PATH, level=DECISION_LOG_LEVEL, sample_rate=DECISION_LOG_SAMPLE_RATE,
+                 error_sample_rate=DECISION_LOG_ERROR_SAMPLE_RATE, queue_size=DECISION_LOG_QUEUE_SIZE):
+        self.path = path
+        self.set_level(level)
+        self.sample_rate = sample_rate
+        self.error_sample_rate = error_sample_rate
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def set_level(self, level):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown decision log level '{level}'. Expected one of: {list(LEVELS)}")
+        self.level = level
+        self.threshold = LEVELS[level]
+
+    def wants(self, level):
+        """Whether a record at level would pass the level filter and the sampler"""
+        if LEVELS[level] < self.threshold:
+            return False
+        rate = self.error_sample_rate if level == "error" else self.sample_rate
+        return rate >= 1.0 or random.random() < rate
+
+    def decision(self, request_id, model_version, row, prediction, probability, elapsed_seconds, cached=False,
+                 threshold=None):
+        """Log one scored application; row is its encoded feature row, threshold the cut-off applied"""
+        if not self.wants("debug" if cached else "info"):
+            return
+        self._offer({
+            "ts": time.time(), "level": "debug" if cached else "info", "event": "decision",
+            "request_id": request_id, "model_version": model_version, "inputs_hash": inputs_hash(row),
+            "prediction": int(prediction), "probability": float(probability), "threshold": threshold,
+            "elapsed_ms": round(elapsed_seconds * 1000.0, 3), "cached": cached,
+        })
+
+    def failure(self, request_id, model_version, error, elapsed_seconds):
+        """Log an application that could not be scored"""
+        if not self.wants("error"):
+            return
+        self._offer({
+            "ts": time.time(), "level": "error", "event": "validation_failed",
+            "request_id": request_id, "model_version": model_version, "error": str(error),
+            "elapsed_ms": round(elapsed_seconds * 1000.0, 3),
+        })
+
+    def _offer(self, record):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # Started on first use, so processes that never score don't get a thread
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="decision-log", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _run(self):
+        # stdout is looked up per write, so a later redirect of sys.stdout is honoured
+        out = None if self.path == "-" else open(self.path, "a", encoding="utf-8")
+        stopping = False
+        while not stopping:
+            records = [self._queue.get()]
+            # Write whatever else is already queued in the same go
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in records:
+                if record is _STOP:
+                    stopping = True
+                    continue
+                record["ts"] = datetime.fromtimestamp(record["ts"], timezone.utc).isoformat()
+                lines.append(json.dumps(record) + "\n")
+            if not lines:
+                continue
+            try:
+                stream = out or sys.stdout
+                stream.write("".join(lines))
+                stream.flush()
+                self.written += len(lines)
+            except Exception as e:
+                self.dropped += len(lines)
+                print(f"Decision log write failed: {str(e)}", file=sys.stderr)
+        if out is not None:
+            out.close()
+
+    def close(self):
+        """Write out what is queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {"level": self.level, "sample_rate": self.sample_rate, "queued": self._queue.qsize(),
+                "written": self.written, "dropped": self.dropped}
+
+
+decision_log = DecisionLogger()
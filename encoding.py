@@ -0,0 +1,128 @@
+import re
+import numpy as np
+import pandas as pd
+
+from metrics import NORMALIZATIONS
+
+# Spellings seen from upstream systems that don't reduce to an encoder class
+# by case or punctuation alone
+CATEGORY_VARIATIONS = {
+    'loan_purpose': {
+        'home improvement': 'Home',
+        'home_improvement': 'Home',
+        'homeimprovement': 'Home',
+        'debt_consolidation': 'Debt consolidation',
+        'debtconsolidation': 'Debt consolidation',
+    },
+}
+
+_PUNCTUATION = re.compile(r'[\W_]+')
+
+
+def fold_key(value):
+    """Case-folded alias key ('  MARRIED ' -> 'married')"""
+    return value.strip().casefold()
+
+
+def strip_key(value):
+    """Case-folded alias key without punctuation or spaces ("Bachelor's" -> 'bachelors')"""
+    return _PUNCTUATION.sub('', value.casefold())
+
+
+class CategoricalLookup:
+    """
+    Flat dict lookup from raw categorical values to LabelEncoder codes.
+    Built once from a fitted encoder; encode() is a dict hit for every
+    spelling seen at compile time and only falls back to building an alias
+    key for spellings it hasn't seen.
+    """
+
+    def __init__(self, column, encoder):
+        self.column = column
+        self.classes = list(encoder.classes_)
+        self.canonical = frozenset(self.classes)
+
+        # LabelEncoder.transform is a searchsorted over the sorted classes_,
+        # so a class's code is simply its position
+        self.exact = {cls: code for code, cls in enumerate(self.classes)}
+        self.aliases = {}
+
+        ambiguous = set()
+        for cls, code in self.exact.items():
+            if not isinstance(cls, str):
+                continue
+            for key in (fold_key(cls), strip_key(cls)):
+                if self.aliases.setdefault(key, code) != code:
+                    ambiguous.add(key)
+        for key in ambiguous:
+            del self.aliases[key]
+
+        for alias, target in CATEGORY_VARIATIONS.get(column, {}).items():
+            if target in self.exact:
+                for key in (fold_key(alias), strip_key(alias)):
+                    self.aliases.setdefault(key, self.exact[target])
+
+        # Pre-seed the exact table with the spellings we expect most often so
+        # those never reach the alias path
+        for cls, code in list(self.exact.items()):
+            if isinstance(cls, str):
+                for spelling in (cls.lower(), cls.upper(), cls.title()):
+                    self.exact.setdefault(spelling, code)
+        for key, code in self.aliases.items():
+            self.exact.setdefault(key, code)
+
+    def encode(self, value):
+        """Return the integer code for value, or None if it matches no class"""
+        code = self._lookup(value)
+        if code is not None and value not in self.canonical:
+            NORMALIZATIONS.inc()
+        return code
+
+    def _lookup(self, value):
+        try:
+            code = self.exact.get(value)
+        except TypeError:  # unhashable
+            return None
+        if code is None and isinstance(value, str):
+            code = self.aliases.get(fold_key(value))
+            if code is None:
+                code = self.aliases.get(strip_key(value))
+        return code
+
+    def normalize(self, value):
+        """Return the encoder class value maps to, or value unchanged if none"""
+        code = self.encode(value)
+        return value if code is None else self.classes[code]
+
+    def class_of(self, value):
+        """Return the encoder class value maps to, or None; not counted as a normalization"""
+        code = self._lookup(value)
+        return None if code is None else self.classes[code]
+
+    def encode_column(self, values):
+        """
+        Encode a whole column. Each distinct value is looked up once.
+        Returns an int64 array with -1 for values that match no class.
+        """
+        value_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        table = np.full(len(uniques) + 1, -1, dtype=np.int64)
+        respelled = []
+        for idx, value in enumerate(uniques):
+            code = self._lookup(value)
+            if code is not None:
+                table[idx] = code
+                if value not in self.canonical:
+                    respelled.append(idx)
+        if respelled:
+            NORMALIZATIONS.inc(int(np.isin(value_codes, respelled).sum()))
+        # factorize marks missing values as -1, which lands on the trailing -1 slot
+        return table[value_codes]
+
+
+def compile_lookups(label_encoders):
+    """Compile every fitted encoder into a CategoricalLookup"""
+    return {
+        column: CategoricalLookup(column, encoder)
+        for column, encoder in label_encoders.items()
+        if hasattr(encoder, 'classes_')
+    }
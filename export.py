@@ -0,0 +1,200 @@
+"""
+Stream a user's prediction history out of the predictions table.
+
+    python export.py --user-id 7 --format csv --output history.csv
+    python export.py --user-id 7 --format csv --output history.csv --resume
+
+Rows are read in keyset pages (see storage.fetch_predictions), so memory
+stays flat however many rows are exported and each page is a short read
+rather than one long transaction. The CLI records the cursor after every
+page in <output>.cursor; --resume picks an interrupted CSV/NDJSON export
+up from there. Parquet needs pyarrow.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+
+from storage import Database, DB_PATH, PREDICTION_COLUMNS, decode_cursor, encode_cursor, fetch_predictions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Rows per keyset page, and per Parquet row group
+EXPORT_CHUNK_ROWS = int(os.getenv("LOAN_EXPORT_CHUNK_ROWS", "10000"))
+
+FLOAT_COLUMNS = {"annual_income", "debt_to_income_ratio", "credit_score", "loan_amount",
+                 "interest_rate", "probability"}
+INT_COLUMNS = {"user_id", "prediction"}
+
+
+def parquet_available():
+    return pa is not None
+
+
+def iter_pages(db, user_id, chunk_rows=EXPORT_CHUNK_ROWS, after=None, start=None, end=None, prediction=None):
+    """Yield (rows, cursor after those rows) for every page of the user's predictions"""
+    cursor = after
+    while True:
+        rows, next_cursor = fetch_predictions(db, user_id, PREDICTION_COLUMNS, chunk_rows, after=cursor,
+                                              start=start, end=end, prediction=prediction)
+        if rows:
+            # PREDICTION_COLUMNS starts with id and ends with created_at
+            cursor = encode_cursor(rows[-1][-1], rows[-1][0])
+            yield rows, cursor
+        if next_cursor is None:
+            return
+
+
+def _ndjson(rows):
+    return "".join(json.dumps(dict(zip(PREDICTION_COLUMNS, row))) + "\n" for row in rows).encode()
+
+
+def _csv(rows, header):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(PREDICTION_COLUMNS)
+    writer.writerows(rows)
+    return out.getvalue().encode()
+
+
+def _parquet_schema():
+    def column_type(column):
+        if column in FLOAT_COLUMNS:
+            return pa.float64()
+        if column in INT_COLUMNS:
+            return pa.int64()
+        return pa.string()
+    return pa.schema([(column, column_type(column)) for column in PREDICTION_COLUMNS])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Parquet records absolute offsets in its footer
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_export(pages, fmt, header=True):
+    """
+    Encode (rows, cursor) pages as fmt. Yields (bytes, cursor) per page;
+    the cursor is where an export resumes after those bytes. Parquet writes
+    one row group per page and its footer as a final (bytes, None).
+    """
+    if fmt == "parquet":
+        if not parquet_available():
+            raise ValueError("Parquet export needs pyarrow installed")
+        schema = _parquet_schema()
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for rows, cursor in pages:
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema))
+                yield sink.drain(), cursor
+        yield sink.drain(), None
+        return
+
+    if header and fmt == "csv":
+        yield _csv([], header=True), None
+    for rows, cursor in pages:
+        yield (_ndjson(rows) if fmt == "ndjson" else _csv(rows, header=False)), cursor
+
+
+def stream_export(db, user_id, fmt, **filters):
+    """Bytes of the export for a chunked HTTP response"""
+    for data, _ in iter_export(iter_pages(db, user_id, **filters), fmt):
+        if data:
+            yield data
+
+
+def export_to_file(db, user_id, fmt, output, resume=False, after=None, **filters):
+    """Write the export to output, checkpointing the cursor after every page; returns the final checkpoint"""
+    state_path = f"{output}.cursor"
+    state = {"cursor": after, "bytes": 0}
+    if resume:
+        if fmt == "parquet":
+            raise ValueError("Parquet exports can't be resumed in place; start a new file with --cursor")
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+
+    mode = "r+b" if resume and os.path.exists(output) else "wb"
+    with open(output, mode) as out:
+        # Drop anything written after the last checkpoint
+        out.seek(state["bytes"])
+        out.truncate()
+        pages = iter_pages(db, user_id, after=state["cursor"], **filters)
+        for data, cursor in iter_export(pages, fmt, header=state["bytes"] == 0):
+            out.write(data)
+            if cursor is not None:
+                out.flush()
+                state["cursor"] = cursor
+                state["bytes"] = out.tell()
+                with open(state_path, "w") as f:
+                    json.dump(state, f)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a user's prediction history")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--start", default=None, help="Earliest created_at (ISO, UTC)")
+    parser.add_argument("--end", default=None, help="created_at upper bound, exclusive (ISO, UTC)")
+    parser.add_argument("--decision", choices=["approved", "rejected"], default=None)
+    parser.add_argument("--cursor", default=None, help="Start after this keyset cursor")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument("--resume", action="store_true", help="Continue from <output>.cursor")
+    args = parser.parse_args()
+
+    if args.cursor:
+        try:
+            decode_cursor(args.cursor)
+        except ValueError as e:
+            parser.error(str(e))
+    prediction = None if args.decision is None else int(args.decision == "approved")
+    try:
+        export_to_file(Database(args.db), args.user_id, args.format, args.output, resume=args.resume,
+                       chunk_rows=args.chunk_rows, after=args.cursor, start=args.start, end=args.end,
+                       prediction=prediction)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Exported predictions for user {args.user_id} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+# bcrypt cost factor; hashes made with any other cost are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("LOAN_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("LOAN_HASH_WORKERS", "1"))
+HASH_MAX_PENDING = int(os.getenv("LOAN_HASH_MAX_PENDING", "64"))
+
+
+class HasherBusyError(Exception):
+    """Raised when the password hasher already holds max_pending requests"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own small thread pool.
+
+    bcrypt is deliberately slow, so a burst of logins would otherwise tie
+    up the request threads and compete with scoring. Here at most workers
+    hashes run at once (bcrypt releases the GIL while it works), and beyond
+    max_pending queued requests HasherBusyError is raised so the API can
+    shed load. The pool is separate from the inference executor.
+
+    context pins bcrypt to rounds: verify_and_update() returns a new hash
+    for any password stored with a different cost.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HasherBusyError(f"{self.pending} password hashes already pending")
+        self.pending += 1
+        try:
+            return await asyncio.wrap_future(self.pool.submit(fn, *args))
+        finally:
+            self.pending -= 1
+
+    async def hash(self, secret):
+        return await self._submit(self.context.hash, secret)
+
+    async def verify_and_update(self, secret, hashed):
+        """(valid, new hash or None); a new hash means the stored one should be replaced"""
+        return await self._submit(self.context.verify_and_update, secret, hashed)
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from registry import ModelRegistry, DEFAULT_ENGINE, DEFAULT_TIER
+
+# Worker-process state: a private registry
+_registry = None
+
+
+class QueueFullError(Exception):
+    """Raised when the executor already holds max_pending requests"""
+
+
+def _init_worker(artifact_dir, engine, tier):
+    """Worker process start-up: build a private registry and preload the model"""
+    global _registry
+    _registry = ModelRegistry(artifact_dir)
+    _registry.get(engine, tier).load()
+
+
+def _worker_predictor(artifact_dir, version, engine, tier):
+    """
+    The worker's predictor, rebuilt unless it is the directory and version
+    the parent is serving. Checked on every call: the directory the worker
+    started with is fixed when the pool is built, not when it first scores.
+    """
+    global _registry
+    if _registry is not None and _registry.artifact_dir == artifact_dir:
+        predictor = _registry.get(engine, tier)
+        predictor.load()
+        if predictor.version == version:
+            return predictor
+    # The parent validated this version before swapping it in
+    _registry = ModelRegistry(artifact_dir)
+    predictor = _registry.get(engine, tier)
+    predictor.load()
+    return predictor
+
+
+def _predict_single(config, features, threshold, request_id, explain):
+    predictor = _worker_predictor(*config)
+    prediction, probability, *explanation = predictor.predict_single(features, threshold, request_id, explain)
+    return (prediction, probability, predictor.version, *explanation)
+
+
+def _predict_many(config, batch, threshold, request_ids):
+    predictor = _worker_predictor(*config)
+    predictions, probabilities, errors = predictor.predict_many(batch, threshold, request_ids)
+    return predictions, probabilities, errors, predictor.version
+
+
+def _ping():
+    return True
+
+
+class InferenceExecutor:
+    """
+    Runs scoring off the event loop in a dedicated pool.
+
+    With workers > 0 that is a pool of worker processes, each holding its own
+    preloaded LoanPredictor, so CPU-bound forest evaluation scales across
+    cores instead of serializing on the GIL. With workers == 0 scoring runs
+    in a small thread pool inside this process.
+
+    At most max_pending requests may be queued or running; beyond that
+    QueueFullError is raised immediately so the API can shed load, and a
+    request still waiting after timeout seconds raises asyncio.TimeoutError.
+    A timed-out request that a worker has already started runs to completion,
+    but its result is discarded; it keeps its pending slot until it finishes.
+    """
+
+    def __init__(self, registry, workers=0, max_pending=64, timeout=10.0, threads=4):
+        self.registry = registry
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        if workers > 0:
+            # spawn rather than fork: the API process already runs threads
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(registry.artifact_dir, DEFAULT_ENGINE, DEFAULT_TIER),
+            )
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="inference")
+
+    def _config(self, predictor):
+        """What a worker process needs to score with the parent's active model"""
+        predictor.load()
+        return (predictor.artifact_dir, predictor.version, DEFAULT_ENGINE, DEFAULT_TIER)
+
+    def _release(self):
+        self.pending -= 1
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise QueueFullError(f"{self.pending} scoring requests already pending")
+        loop = asyncio.get_running_loop()
+        future = self.pool.submit(fn, *args)
+        self.pending += 1
+
+        def finished(_):
+            # Runs on the pool's thread once the work is done or cancelled
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:  # event loop already closed
+                pass
+
+        future.add_done_callback(finished)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+
+    async def predict_single(self, features, threshold=None, request_id=None, explain=False):
+        """(prediction, probability, model_version) for one application, plus the explanation with explain=True"""
+        predictor = self.registry.get()
+        if self.workers > 0:
+            return await self._submit(_predict_single, self._config(predictor), features, threshold, request_id,
+                                      explain)
+        prediction, probability, *explanation = await self._submit(predictor.predict_single, features, threshold,
+                                                                   request_id, explain)
+        return (prediction, probability, predictor.version, *explanation)
+
+    async def predict_many(self, batch, threshold=None, request_ids=None):
+        """(predictions, probabilities, errors, model_version) for a batch"""
+        predictor = self.registry.get()
+        if self.workers > 0:
+            return await self._submit(_predict_many, self._config(predictor), batch, threshold, request_ids)
+        predictions, probabilities, errors = await self._submit(predictor.predict_many, batch, threshold,
+                                                                request_ids)
+        return predictions, probabilities, errors, predictor.version
+
+    def warm(self):
+        """Start every worker process now rather than on its first request"""
+        if self.workers > 0:
+            for future in [self.pool.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+JOB_COLUMNS = [
+    "id", "user_id", "filename", "status", "rows_done", "rows_failed", "bytes_total",
+    "bytes_done", "model_version", "model_tier", "error", "created_at", "started_at", "finished_at",
+]
+
+# Rows read back per chunk when streaming results
+RESULT_CHUNK_ROWS = 10000
+
+
+class BatchJobManager:
+    """
+    Background scoring of uploaded CSV files.
+
+    submit() copies the upload into jobs_dir, records a queued job in the
+    batch_jobs table and returns its id straight away; a small thread pool
+    then scores the file chunk by chunk with score_chunks (see
+    backend.score_csv_chunks), updating progress after every chunk and
+    appending per-row results to <job id>.results.csv for iter_results().
+
+    With retention_seconds set, finished jobs older than that are deleted
+    along with their files by sweep(), which runs at startup and whenever
+    a new job is created.
+    """
+
+    def __init__(self, db, score_chunks, jobs_dir, max_workers=2, retention_seconds=None):
+        self.db = db
+        self.score_chunks = score_chunks
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-job")
+        self._create_table()
+        self.sweep()
+
+    def _create_table(self):
+        with self.db.transaction() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER,
+                filename TEXT,
+                status TEXT,
+                rows_done INTEGER DEFAULT 0,
+                rows_failed INTEGER DEFAULT 0,
+                bytes_total INTEGER,
+                bytes_done INTEGER DEFAULT 0,
+                model_version TEXT,
+                model_tier TEXT,
+                error TEXT,
+                created_at TEXT,
+                started_at TEXT,
+                finished_at TEXT
+            )
+            """)
+            if "model_tier" not in {row[1] for row in conn.execute("PRAGMA table_info(batch_jobs)")}:
+                # Tables created before jobs recorded the tier
+                conn.execute("ALTER TABLE batch_jobs ADD COLUMN model_tier TEXT")
+            # Jobs a previous process was working on will never finish
+            conn.execute(
+                "UPDATE batch_jobs SET status='failed', error='Interrupted by a server restart' "
+                "WHERE status IN ('queued', 'running')"
+            )
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name}=?" for name in fields)
+        with self.db.transaction() as conn:
+            conn.execute(f"UPDATE batch_jobs SET {assignments} WHERE id=?", (*fields.values(), job_id))
+
+    def input_path(self, job_id):
+        return self.jobs_dir / f"{job_id}.csv"
+
+    def results_path(self, job_id):
+        return self.jobs_dir / f"{job_id}.results.csv"
+
+    def sweep(self, now=None):
+        """Delete finished jobs past the retention period and their files; returns how many"""
+        if not self.retention_seconds:
+            return 0
+        cutoff = ((now or datetime.utcnow()) - timedelta(seconds=self.retention_seconds)).isoformat()
+        with self.db.transaction() as conn:
+            # Jobs failed by a restart never got a finished_at, so fall back to when they were created
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM batch_jobs WHERE status IN ('completed', 'failed') "
+                "AND COALESCE(finished_at, created_at) < ?", (cutoff,))]
+            conn.executemany("DELETE FROM batch_jobs WHERE id=?", [(job_id,) for job_id in expired])
+        for job_id in expired:
+            self.input_path(job_id).unlink(missing_ok=True)
+            self.results_path(job_id).unlink(missing_ok=True)
+        if expired:
+            print(f"Removed {len(expired)} batch jobs older than {self.retention_seconds:g} seconds")
+        return len(expired)
+
+    def _create(self, fileobj, filename, user_id):
+        """Spool the upload to disk and record a queued job"""
+        self.sweep()
+        job_id = str(uuid.uuid4())
+        with open(self.input_path(job_id), "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1 << 20)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO batch_jobs (id, user_id, filename, status, bytes_total, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, user_id, filename, os.path.getsize(self.input_path(job_id)),
+                 datetime.utcnow().isoformat()),
+            )
+        return job_id
+
+    def submit(self, fileobj, filename, user_id, predictor):
+        """Queue a CSV for background scoring and return the job id"""
+        job_id = self._create(fileobj, filename, user_id)
+        self.executor.submit(self._run, job_id, user_id, predictor)
+        return job_id
+
+    def run(self, fileobj, filename, user_id, predictor):
+        """Score a CSV in the calling thread, recording it as a job; returns the job"""
+        job_id = self._create(fileobj, filename, user_id)
+        self._run(job_id, user_id, predictor)
+        return self.get(job_id, user_id)
+
+    def _run(self, job_id, user_id, predictor):
+        self._update(job_id, status="running", started_at=datetime.utcnow().isoformat())
+        rows_done, rows_failed = 0, 0
+        results_path = self.results_path(job_id)
+        try:
+            with open(self.input_path(job_id), "rb") as f:
+                for chunk in self.score_chunks(f, user_id, predictor):
+                    self._append_results(results_path, chunk, header=rows_done + rows_failed == 0)
+                    rows_done += chunk["count"]
+                    rows_failed += chunk["failed"]
+                    self._update(job_id, rows_done=rows_done, rows_failed=rows_failed,
+                                 bytes_done=f.tell(), model_version=predictor.version, model_tier=predictor.tier)
+            if not results_path.exists():
+                results_path.write_text("row,id,prediction,probability,error\n")
+            self._update(job_id, status="completed", finished_at=datetime.utcnow().isoformat())
+        except Exception as e:
+            print(f"Batch job {job_id} failed: {str(e)}")
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow().isoformat())
+        finally:
+            self.input_path(job_id).unlink(missing_ok=True)
+
+    def _append_results(self, path, chunk, header):
+        """Append one scored chunk to the job's results file, in file row order"""
+        valid = chunk["valid"]
+        results = pd.DataFrame({
+            "row": chunk["rows"],
+            "id": None,
+            "prediction": pd.array(chunk["predictions"], dtype="Int64"),
+            "probability": chunk["probabilities"],
+            "error": None,
+        })
+        results.loc[valid, "id"] = chunk["ids"]
+        results.loc[~valid, "prediction"] = pd.NA
+        results.loc[~valid, "error"] = [chunk["errors"][row] for row in results["row"][~valid]]
+        results.to_csv(path, mode="a", header=header, index=False)
+
+    def get(self, job_id, user_id):
+        """Job status and progress, or None if the user has no such job"""
+        row = self.db.execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM batch_jobs WHERE id=? AND user_id=?",
+            (job_id, user_id),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+
+        progress = job["bytes_done"] / job["bytes_total"] if job["bytes_total"] else 0.0
+        if job["status"] == "completed":
+            progress = 1.0
+        job["progress"] = round(progress, 4)
+        job["eta_seconds"] = None
+        if job["status"] == "running" and job["started_at"] and progress > 0:
+            elapsed = (datetime.utcnow() - datetime.fromisoformat(job["started_at"])).total_seconds()
+            job["eta_seconds"] = round(elapsed * (1 - progress) / progress, 1)
+        return job
+
+    def iter_results(self, job_id, fmt="csv"):
+        """Stream a finished job's results as CSV text or a JSON array, chunk by chunk"""
+        path = self.results_path(job_id)
+        if fmt == "csv":
+            with open(path, "r", newline="") as f:
+                while block := f.read(1 << 16):
+                    yield block
+            return
+
+        yield "["
+        first = True
+        for chunk in pd.read_csv(path, chunksize=RESULT_CHUNK_ROWS, dtype={"prediction": "Int64"},
+                                 float_precision="round_trip"):
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict(orient="records")
+            if records:
+                yield ("" if first else ",") + ",".join(json.dumps(record) for record in records)
+                first = False
+        yield "]"
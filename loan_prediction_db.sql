@@ -94,7 +94,8 @@ INSERT INTO `users` (`id`, `email`, `username`, `hashed_password`, `full_name`,
 --
 ALTER TABLE `predictions`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `ix_predictions_id` (`id`);
+  ADD KEY `ix_predictions_id` (`id`),
+  ADD KEY `ix_predictions_user_created` (`user_id`,`created_at`);
 
 --
 -- Indexes for table `users`
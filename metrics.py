@@ -0,0 +1,162 @@
+"""
+In-process metrics, served in Prometheus text format by backend's /metrics.
+
+Instruments are created once, up front. Histogram.observe() is a bisect
+over fixed bucket bounds plus two in-place adds on preallocated storage,
+with no lock: under heavy thread contention an increment can very
+occasionally be lost, which is acceptable for monitoring and keeps the
+hot path at a few hundred nanoseconds. Buckets are only made cumulative
+when render() builds the page.
+
+Scoring stages are timed where they run. With LOAN_INFERENCE_WORKERS > 0
+the model stages (normalize, encode, scale, forest, explain) run in worker
+processes and are recorded there, not in the API process.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds, 50us to 10s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SCORING_STAGES = ("parse", "normalize", "encode", "scale", "forest", "explain", "db_write", "serialize")
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def observe_since(self, started):
+        """Observe the time since started (a time.perf_counter() reading); returns now"""
+        now = time.perf_counter()
+        self.counts[bisect_left(self.bounds, now - started)] += 1
+        self.sum += now - started
+        return now
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Named metric families; each family holds one series per label set"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()  # registration only, never taken on observe
+
+    def _register(self, name, kind, help, labels, metric):
+        with self._lock:
+            family = self._families.setdefault(name, {"kind": kind, "help": help, "series": []})
+            if family["kind"] != kind:
+                raise ValueError(f"Metric {name} is already registered as a {family['kind']}")
+            family["series"].append((dict(labels or {}), metric))
+        return metric
+
+    def histogram(self, name, help, labels=None, bounds=LATENCY_BUCKETS):
+        return self._register(name, "histogram", help, labels, Histogram(bounds))
+
+    def counter(self, name, help, labels=None):
+        return self._register(name, "counter", help, labels, Counter())
+
+    def callback(self, name, help, fn, labels=None, kind="gauge"):
+        """A series whose value fn() returns at render time (None leaves it out)"""
+        return self._register(name, kind, help, labels, fn)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            families = [(name, dict(family, series=list(family["series"])))
+                        for name, family in self._families.items()]
+        for name, family in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for labels, metric in family["series"]:
+                if isinstance(metric, Histogram):
+                    counts, total = list(metric.counts), metric.sum
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds + (float("inf"),), counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(float(bound))
+                        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                    continue
+                value = metric.value if isinstance(metric, Counter) else metric()
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = {
+    stage: metrics.histogram("loan_scoring_stage_seconds",
+                             "Time spent in each stage of scoring a request. parse runs from the request "
+                             "arriving to the handler starting (body, validation, auth); normalize maps "
+                             "categorical values to encoder classes; explain only runs for requests that "
+                             "ask for an explanation.",
+                             {"stage": stage})
+    for stage in SCORING_STAGES
+}
+NORMALIZATIONS = metrics.counter("loan_normalizations_total",
+                                 "Categorical values mapped to an encoder class from another spelling")
+VALIDATION_FAILURES = metrics.counter("loan_validation_failures_total",
+                                      "Applications that failed validation while being scored")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: stamps scope["state"]["received_at"] for the parse
+    stage and records loan_request_seconds per route, including the time
+    to stream the response.
+    """
+
+    def __init__(self, app, registry=metrics):
+        self.app = app
+        self.registry = registry
+        self._routes = {}
+
+    def _histogram(self, route):
+        histogram = self._routes.get(route)
+        if histogram is None:
+            histogram = self._routes.setdefault(route, self.registry.histogram(
+                "loan_request_seconds", "HTTP request latency by route", {"route": route}))
+        return histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        scope.setdefault("state", {})["received_at"] = started
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            self._histogram(getattr(route, "path", "unmatched")).observe_since(started)
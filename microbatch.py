@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+# Upper edges of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-application requests into one batch call.
+
+    submit() parks the caller's features and waits. The pending rows are
+    scored together with score_batch (see InferenceExecutor.predict_many)
+    as soon as max_rows have queued up or max_wait_ms has passed since the
+    first of them arrived, whichever comes first, and each caller gets back
+    its own (prediction, probability, model_version). A row that fails
+    validation raises ValueError for its caller only; a failure of the whole
+    batch call (overload, timeout) is raised to every caller in the batch.
+    """
+
+    def __init__(self, score_batch, max_wait_ms=2.0, max_rows=64):
+        self.score_batch = score_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_rows = max_rows
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.wait_seconds = 0.0
+
+    @property
+    def pending_rows(self):
+        """Rows waiting for their batch to be flushed"""
+        return len(self._pending)
+
+    async def submit(self, features, request_id=None):
+        """(prediction, probability, model_version) for one application"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future, time.perf_counter(), request_id))
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._score(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch):
+        started = time.perf_counter()
+        self._record(batch, started)
+        try:
+            predictions, probabilities, errors, version = await self.score_batch(
+                [row for row, _, _, _ in batch], request_ids=[request_id for _, _, _, request_id in batch])
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for idx, (_, future, _, _) in enumerate(batch):
+            if future.done():  # caller went away
+                continue
+            if idx in errors:
+                future.set_exception(ValueError(f"Prediction error: {errors[idx]}"))
+            else:
+                future.set_result((int(predictions[idx]), float(probabilities[idx]), version))
+
+    def _record(self, batch, started):
+        size = len(batch)
+        self.batches += 1
+        self.rows += size
+        self.largest_batch = max(self.largest_batch, size)
+        bucket = next((i for i, edge in enumerate(BATCH_SIZE_BUCKETS) if size <= edge), len(BATCH_SIZE_BUCKETS))
+        self.size_counts[bucket] += 1
+        self.wait_seconds += sum(started - queued for _, _, queued, _ in batch)
+
+    def stats(self):
+        """Achieved batch sizes and the time rows spent waiting for their batch"""
+        labels = [f"<={edge}" for edge in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else None,
+            "largest_batch": self.largest_batch,
+            "batch_sizes": dict(zip(labels, self.size_counts)),
+            "mean_wait_ms": round(self.wait_seconds / self.rows * 1000.0, 3) if self.rows else None,
+        }
@@ -5,19 +5,157 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.pipeline import Pipeline
 import joblib
 import os
+import hashlib
+import tempfile
+import threading
+import time
 from pathlib import Path
+from encoding import compile_lookups
+from forest_engine import CompiledForest, check_parity, fuse_scaler
+from metrics import STAGE_SECONDS, VALIDATION_FAILURES
+from decision_log import decision_log
+
+# Feature order matching the trained model
+FEATURE_ORDER = [
+    'annual_income', 'debt_to_income_ratio', 'credit_score',
+    'loan_amount', 'interest_rate', 'gender', 'marital_status',
+    'education_level', 'employment_status', 'loan_purpose', 'grade_subgrade'
+]
+
+# Columns fed to the scaler as-is
+NUMERIC_COLS = ['annual_income', 'debt_to_income_ratio', 'credit_score',
+                'loan_amount', 'interest_rate']
+
+# Categorical columns that need encoding
+CATEGORICAL_COLS = ['gender', 'marital_status', 'education_level',
+                    'employment_status', 'loan_purpose', 'grade_subgrade']
+
+# Ways of evaluating the forest: sklearn's own predict_proba, the flat-array
+# engine, or the flat-array engine with the scaler folded into its thresholds
+ENGINES = ('sklearn', 'compiled', 'fused')
+
+# Model artifact per tier: interactive traffic can load a reduced forest built
+# by model_tiers.py while batch reporting keeps the full one
+TIERS = {
+    'full': 'model.pkl',
+    'fast': 'model_fast.pkl',
+}
+
+# Written by train.py --install with the version it is installing; until the
+# files match it the registry treats the directory as half-installed
+INSTALL_MARKER = 'installed_version'
+
+# Largest batch predict_many looks up row by row in the score cache
+CACHE_MAX_BATCH_ROWS = 256
+
+# Features an explanation names as reasons, most adverse first
+REASON_CODES = 4
+
+_NORMALIZE_SECONDS = STAGE_SECONDS['normalize']
+_ENCODE_SECONDS = STAGE_SECONDS['encode']
+_SCALE_SECONDS = STAGE_SECONDS['scale']
+_FOREST_SECONDS = STAGE_SECONDS['forest']
+_EXPLAIN_SECONDS = STAGE_SECONDS['explain']
+
+# (path, mtime, size) of each file -> fingerprint, so unchanged files are hashed once
+_fingerprints = {}
+
+def artifact_fingerprint(*paths):
+    """Short content hash of one or more artifact files"""
+    stats = tuple((str(path), os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+    if stats in _fingerprints:
+        return _fingerprints[stats]
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    _fingerprints[stats] = digest.hexdigest()[:16]
+    return _fingerprints[stats]
+
+def _dump_atomic(obj, path):
+    """
+    joblib.dump to a temp file beside path, then rename it over path.
+    Other processes may have the old file memory-mapped; truncating it in
+    place would crash them (SIGBUS), while a rename leaves their mapping intact.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    os.close(fd)
+    try:
+        os.chmod(tmp, 0o644)
+        joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _numeric_error(col, value):
+    """Validation message for a numeric field that is missing or not a finite number"""
+    if pd.isna(value):
+        return f"Missing value for {col}"
+    return f"Invalid value for {col}: '{value}'"
+
+
+def _explanation(base_value, contributions):
+    """One row's contributions by feature name, and the features that lowered its approval probability most"""
+    adverse = np.argsort(contributions, kind='stable')[:REASON_CODES]
+    return {
+        'base_value': base_value,
+        'contributions': {col: float(value) for col, value in zip(FEATURE_ORDER, contributions)},
+        'reason_codes': [FEATURE_ORDER[idx] for idx in adverse if contributions[idx] < 0],
+    }
 
 class LoanPredictor:
-    def __init__(self):
+    def __init__(self, decision_threshold=None, engine='sklearn', tier='full',
+                 artifact_dir=None, lazy=False, score_cache=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Expected one of: {list(ENGINES)}")
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier '{tier}'. Expected one of: {list(TIERS)}")
+        if decision_threshold is not None and not 0.0 <= decision_threshold <= 1.0:
+            raise ValueError(f"decision_threshold must lie in [0, 1], got {decision_threshold}")
         self.model = None
+        self.forest = None  # Whatever _score calls predict_proba on
         self.scaler = None
         self.label_encoders = {}
-        self.model_path = str(Path(__file__).parent / 'model.pkl')
-        self.scaler_path = str(Path(__file__).parent / 'scaler.pkl')
-        self.encoders_path = str(Path(__file__).parent / 'label_encoders.pkl')
-        self._load_model()
-        self._load_scaler()
-        self._load_encoders()
+        self.categorical_lookups = {}
+        # Approval cut-off on the class-1 probability; None keeps model.predict's argmax
+        self.decision_threshold = decision_threshold
+        self.engine = engine
+        self.tier = tier
+        artifact_dir = Path(artifact_dir) if artifact_dir else Path(__file__).parent
+        self.artifact_dir = str(artifact_dir)
+        self.model_path = str(artifact_dir / TIERS[tier])
+        self.scaler_path = str(artifact_dir / 'scaler.pkl')
+        self.encoders_path = str(artifact_dir / 'label_encoders.pkl')
+        self.compiled_path = str(artifact_dir / f'compiled_{TIERS[tier]}')
+        self.fused_path = str(artifact_dir / f'fused_{TIERS[tier]}')
+        self.version = None  # Content fingerprint of the artifact set
+        # Optional cache.ScoreCache of results for repeated applications
+        self.score_cache = score_cache
+        self._explainer = None  # CompiledForest for explanations, built on first use
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """Load every artifact; with lazy=True this runs on the first prediction instead"""
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._load_scaler()
+            self._load_encoders()
+            self._load_engine()
+            self._load_version()
+            self._loaded = True
+
+    def _load_version(self):
+        """Fingerprint the model, scaler and encoder files this predictor was built from"""
+        paths = [p for p in (self.model_path, self.scaler_path, self.encoders_path) if os.path.exists(p)]
+        self.version = artifact_fingerprint(*paths) if paths else None
     
     def _load_model(self):
         """Load the model from disk"""
@@ -49,12 +187,6 @@ class LoanPredictor:
             if os.path.exists(self.encoders_path):
                 self.label_encoders = joblib.load(self.encoders_path)
                 print("Label encoders loaded successfully")
-                
-                # Print what values each encoder expects
-                print("\nExpected values for categorical features:")
-                for key, encoder in self.label_encoders.items():
-                    if hasattr(encoder, 'classes_'):
-                        print(f"  {key}: {list(encoder.classes_)}")
             else:
                 print(f"Label encoders file not found at {self.encoders_path}")
                 # Create default encoders based on your data
@@ -69,108 +201,344 @@ class LoanPredictor:
         except Exception as e:
             print(f"Error loading encoders: {str(e)}")
             self.label_encoders = {}
-    
-    def _normalize_categorical_value(self, column, value):
-        """Normalize categorical values to match encoder expectations"""
-        if not value or not isinstance(value, str):
-            return value
-        
-        # Get expected values from encoder
-        if column in self.label_encoders and hasattr(self.label_encoders[column], 'classes_'):
-            expected_values = list(self.label_encoders[column].classes_)
-            
-            # Try exact match first
-            if value in expected_values:
-                return value
-            
-            # Try case-insensitive match
-            value_lower = value.lower().strip()
-            for expected in expected_values:
-                if expected.lower() == value_lower:
-                    print(f"Normalized '{value}' to '{expected}' for {column}")
-                    return expected
-            
-            # Special handling for common variations
-            if column == 'loan_purpose':
-                # Handle common variations in loan purpose
-                variations = {
-                    'home improvement': 'Home',
-                    'home_improvement': 'Home',
-                    'homeimprovement': 'Home',
-                    'debt_consolidation': 'Debt consolidation',
-                    'debtconsolidation': 'Debt consolidation',
-                }
-                
-                if value_lower in variations:
-                    result = variations[value_lower]
-                    print(f"Normalized '{value}' to '{result}' for {column}")
-                    return result
-                
-                # Try to find match in expected values
-                for expected in expected_values:
-                    if expected.lower().replace(' ', '').replace('_', '') == value_lower.replace(' ', '').replace('_', ''):
-                        print(f"Normalized '{value}' to '{expected}' for {column}")
-                        return expected
         
-        return value
+        # Compile the encoders into flat lookups once instead of per request
+        self.categorical_lookups = compile_lookups(self.label_encoders)
     
-    def predict_single(self, features):
+    def _load_engine(self):
+        """Set up whatever evaluates the forest, falling back to sklearn's own predict_proba"""
+        self.forest = None
+        if self.engine != 'sklearn':
+            self.forest = self._load_flat_forest()
+            if self.forest is None:
+                self.engine = 'sklearn'
+        if self.forest is None:
+            if self.model is None:
+                self._load_model()
+            self.forest = self.model
+
+    def _load_flat_forest(self):
+        """
+        Load the compiled or fused forest artifact, rebuilding it from model.pkl
+        (and scaler.pkl when fused) if it is missing or stale. The artifact is
+        an uncompressed joblib dump whose node arrays are memory-mapped, so
+        every worker process shares one page-cache copy and model.pkl itself
+        is never unpickled while the artifact is current.
+        """
+        fused = self.engine == 'fused'
+        kind = 'Fused' if fused else 'Compiled'
+        path = self.fused_path if fused else self.compiled_path
+        try:
+            if fused and self.scaler is None:
+                return None
+            sources = [self.model_path, self.scaler_path] if fused else [self.model_path]
+            source = artifact_fingerprint(*sources)
+            if os.path.exists(path):
+                forest = joblib.load(path, mmap_mode='r')
+                if getattr(forest, 'source_fingerprint', None) == source:
+                    print(f"{kind} model loaded successfully")
+                    return forest
+                print(f"{kind} model is stale, rebuilding")
+
+            self._load_model()
+            if self.model is None:
+                return None
+            forest = CompiledForest.from_sklearn(self.model)
+            if fused:
+                forest = fuse_scaler(forest, self.scaler)
+            if not check_parity(self.model, forest, scaler=self.scaler if fused else None):
+                print(f"{kind} model does not match the sklearn model, using sklearn engine")
+                return None
+            forest.source_fingerprint = source
+            try:
+                _dump_atomic(forest, path)
+                print(f"{kind} model built and saved to {path}")
+                return joblib.load(path, mmap_mode='r')
+            except OSError as e:
+                print(f"Could not save {kind.lower()} model ({str(e)}), keeping it in memory")
+                return forest
+        except Exception as e:
+            print(f"Error loading {kind.lower()} model: {str(e)}")
+            return None
+
+    def _transform(self, X):
+        """Scale raw feature rows for the forest; a fused forest takes them as they are"""
+        if self.engine == 'fused':
+            return X
+        return self.scaler.transform(pd.DataFrame(X, columns=FEATURE_ORDER))
+
+    def _score(self, features_scaled, threshold=None):
+        """
+        Run the forest once and derive both the label and the approval probability.
+        Without a threshold the label is exactly what model.predict would return.
+        """
+        if threshold is None:
+            threshold = self.decision_threshold
+
+        proba = self.forest.predict_proba(features_scaled)
+        if proba.shape[1] == 1:
+            probabilities = proba[:, 0]
+        else:
+            probabilities = proba[:, 1]  # Probability of class 1 (approved)
+
+        if threshold is None:
+            predictions = self.forest.classes_.take(np.argmax(proba, axis=1))
+        else:
+            predictions = probabilities >= threshold
+        return predictions.astype(np.int64), probabilities
+
+    def _load_explainer(self):
+        """The flat forest explanations walk; it takes the same input as self.forest"""
+        with self._load_lock:
+            if self._explainer is None:
+                if isinstance(self.forest, CompiledForest):
+                    self._explainer = self.forest
+                elif hasattr(self.model, 'estimators_'):
+                    # sklearn engine: flatten the model once, on the first explanation
+                    self._explainer = CompiledForest.from_sklearn(self.model)
+                else:
+                    raise ValueError(f"Explanations need a tree ensemble, the {self.tier} tier is a "
+                                     f"{type(self.model).__name__}")
+        return self._explainer
+
+    def _explain(self, features_scaled):
+        """Explanations of the approval probability for rows of _transform() output"""
+        explainer = self._explainer or self._load_explainer()
+        class_index = 0 if len(explainer.classes_) == 1 else 1  # as _score reads the probability
+        base_value, contributions = explainer.contributions(features_scaled, class_index)
+        return [_explanation(base_value, row) for row in contributions]
+
+    def _cache_key(self, row, threshold):
+        """Score cache key for one encoded feature row (+ 0.0 folds -0.0 into 0.0)"""
+        if threshold is None:
+            threshold = self.decision_threshold
+        return (self.version, threshold, (row + 0.0).tobytes())
+
+    def predict_single(self, features, threshold=None, request_id=None, explain=False):
         """
         Make prediction for a single loan application.
         Uses ONLY the trained machine learning model - NO business rules.
+        Pass threshold to approve on probability >= threshold instead of the model's own decision.
+        The decision goes to the decision log under request_id.
+        With explain=True an explanation dict (base_value, per-feature
+        contributions to the approval probability, reason_codes) is returned
+        as a third value.
         """
-        if self.model is None or self.scaler is None:
+        if not self._loaded:
+            self.load()
+        if self.forest is None or self.scaler is None:
             raise ValueError("Model or scaler not loaded. Please check if model.pkl and scaler.pkl exist.")
             
+        if threshold is None:
+            threshold = self.decision_threshold
+        received = started = time.perf_counter()
         try:
-            # Feature order matching your trained model
-            feature_order = [
-                'annual_income', 'debt_to_income_ratio', 'credit_score', 
-                'loan_amount', 'interest_rate', 'gender', 'marital_status', 
-                'education_level', 'employment_status', 'loan_purpose', 'grade_subgrade'
-            ]
-            
-            # Categorical columns that need encoding
-            categorical_cols = ['gender', 'marital_status', 'education_level', 
-                              'employment_status', 'loan_purpose', 'grade_subgrade']
-            
+            # Map categorical values (any known spelling) to encoder codes
+            codes = {}
+            for col in CATEGORICAL_COLS:
+                if col in features and col in self.categorical_lookups:
+                    lookup = self.categorical_lookups[col]
+                    code = lookup.encode(features[col])
+                    if code is None:
+                        VALIDATION_FAILURES.inc()
+                        raise ValueError(f"Invalid value for {col}: '{features[col]}'. Expected one of: {lookup.classes}")
+                    codes[col] = code
+            started = _NORMALIZE_SECONDS.observe_since(started)
+
             # Encode categorical features
-            encoded_features = features.copy()
-            for col in categorical_cols:
-                if col in encoded_features and col in self.label_encoders:
-                    try:
-                        # Normalize the value before encoding
-                        normalized_value = self._normalize_categorical_value(col, encoded_features[col])
-                        encoded_features[col] = self.label_encoders[col].transform([normalized_value])[0]
-                    except ValueError as e:
-                        # Get expected values for better error message
-                        expected = list(self.label_encoders[col].classes_) if hasattr(self.label_encoders[col], 'classes_') else 'unknown'
-                        raise ValueError(f"Invalid value for {col}: '{encoded_features[col]}'. Expected one of: {expected}")
-            
-            # Create DataFrame with feature names
-            features_df = pd.DataFrame([[encoded_features[col] for col in feature_order]], 
-                                      columns=feature_order)
-            
-            # Scale features
-            features_scaled = self.scaler.transform(features_df)
-            
-            # Get ML model prediction - PURE ML, NO RULES
-            prediction = self.model.predict(features_scaled)[0]
-            proba = self.model.predict_proba(features_scaled)[0]
-            
-            # Get probability for the predicted class
-            if len(proba) == 1:
-                probability = proba[0]
+            encoded_features = {**features, **codes}
+            X = np.array([[encoded_features[col] for col in FEATURE_ORDER]], dtype=np.float64)
+            # NaN/inf pass request validation; reject them as predict_many does, whatever the engine
+            finite = np.isfinite(X[0])
+            if not finite.all():
+                VALIDATION_FAILURES.inc()
+                raise ValueError("; ".join(_numeric_error(col, features[col])
+                                           for col, ok in zip(FEATURE_ORDER, finite) if not ok))
+            started = _ENCODE_SECONDS.observe_since(started)
+
+            # Resubmitted applications are answered from the cache
+            cache_key = cached = features_scaled = None
+            if self.score_cache is not None:
+                cache_key = self._cache_key(X[0], threshold)
+                cached = self.score_cache.get(cache_key)
+            if cached is not None:
+                prediction, probability = cached
             else:
-                probability = proba[1]  # Probability of class 1 (approved)
-            
-            # Log the decision
-            print(f"\n--- Pure ML Prediction ---")
-            print(f"Prediction: {'APPROVED' if prediction == 1 else 'REJECTED'}")
-            print(f"Confidence: {probability:.2%}")
-            print(f"-------------------------\n")
+                # Scale features
+                features_scaled = self._transform(X)
+                started = _SCALE_SECONDS.observe_since(started)
+
+                # Get ML model prediction - PURE ML, NO RULES
+                predictions, probabilities = self._score(features_scaled, threshold)
+                _FOREST_SECONDS.observe_since(started)
+                prediction, probability = int(predictions[0]), float(probabilities[0])
+                if cache_key is not None:
+                    self.score_cache.put(cache_key, (prediction, probability))
             
-            return int(prediction), float(probability)
+            # Log the decision (sampled and written in the background)
+            decision_log.decision(request_id, self.version, X[0], prediction, probability,
+                                  time.perf_counter() - received, cached=cached is not None, threshold=threshold)
             
         except Exception as e:
-            raise ValueError(f"Prediction error: {str(e)}")
\ No newline at end of file
+            decision_log.failure(request_id, self.version, e, time.perf_counter() - received)
+            raise ValueError(f"Prediction error: {str(e)}")
+
+        if explain:
+            started = time.perf_counter()
+            if features_scaled is None:
+                features_scaled = self._transform(X)
+            explanation = self._explain(features_scaled)[0]
+            _EXPLAIN_SECONDS.observe_since(started)
+            return int(prediction), float(probability), explanation
+
+        return int(prediction), float(probability)
+
+    def _batch_to_frame(self, batch):
+        """Turn a DataFrame, dict of arrays or list of dicts into a DataFrame"""
+        if isinstance(batch, pd.DataFrame):
+            return batch
+        if isinstance(batch, dict):
+            return pd.DataFrame({col: np.asarray(values) for col, values in batch.items()})
+        return pd.DataFrame.from_records(list(batch))
+
+    def _normalize_batch(self, frame):
+        """Encoder codes (int64, -1 where nothing matches) for each categorical column in the frame"""
+        return {
+            col: self.categorical_lookups[col].encode_column(frame[col].to_numpy(dtype=object))
+            for col in CATEGORICAL_COLS
+            if col in frame and col in self.categorical_lookups
+        }
+
+    def _encode_batch(self, frame, codes=None):
+        """
+        Encode a batch into the raw (unscaled) feature matrix.
+        codes is _normalize_batch(frame), computed here if not given.
+        Returns the matrix and a dict of row index -> error message for the
+        rows that could not be encoded. Failed rows are left as NaN.
+        """
+        if codes is None:
+            codes = self._normalize_batch(frame)
+        n_rows = len(frame)
+        X = np.full((n_rows, len(FEATURE_ORDER)), np.nan)
+        errors = {}
+
+        def add_error(col, raw, rows, message_for):
+            for row in map(int, rows):
+                if pd.isna(raw[row]):
+                    message = f"Missing value for {col}"
+                else:
+                    message = message_for(raw[row])
+                errors[row] = f"{errors[row]}; {message}" if row in errors else message
+
+        for idx, col in enumerate(FEATURE_ORDER):
+            if col not in frame:
+                add_error(col, np.full(n_rows, None), range(n_rows), None)
+                continue
+            raw = frame[col].to_numpy(dtype=object)
+
+            if col in NUMERIC_COLS:
+                values = pd.to_numeric(frame[col], errors='coerce').to_numpy(dtype=float)
+                bad = np.flatnonzero(~np.isfinite(values))
+                add_error(col, raw, bad, lambda value: _numeric_error(col, value))
+                X[:, idx] = values
+                continue
+
+            lookup = self.categorical_lookups.get(col)
+            if lookup is None:
+                add_error(col, raw, range(n_rows), lambda value: f"No encoder loaded for {col}")
+                continue
+
+            bad = np.flatnonzero(codes[col] < 0)
+            add_error(col, raw, bad,
+                      lambda value: f"Invalid value for {col}: '{value}'. Expected one of: {lookup.classes}")
+            X[:, idx] = codes[col]
+
+        return X, errors
+
+    def predict_many(self, batch, threshold=None, request_ids=None):
+        """
+        Make predictions for a batch of loan applications in one vectorized pass.
+        Accepts a DataFrame, a dict of column arrays or a list of dicts.
+
+        threshold works as in predict_single. With request_ids (one per row,
+        as for micro-batched requests) every row goes to the decision log.
+
+        Returns (predictions, probabilities, errors): predictions is an int
+        array (-1 for rows that failed validation), probabilities a float
+        array (NaN for failed rows) and errors a dict of row index -> message.
+        """
+        if not self._loaded:
+            self.load()
+        if self.forest is None or self.scaler is None:
+            raise ValueError("Model or scaler not loaded. Please check if model.pkl and scaler.pkl exist.")
+
+        # encode covers building the frame and the matrix, normalize the categorical lookups in between
+        if threshold is None:
+            threshold = self.decision_threshold
+        received = time.perf_counter()
+        frame = self._batch_to_frame(batch)
+        framed = time.perf_counter()
+        codes = self._normalize_batch(frame)
+        normalized = _NORMALIZE_SECONDS.observe_since(framed)
+        X, errors = self._encode_batch(frame, codes)
+        started = time.perf_counter()
+        _ENCODE_SECONDS.observe((framed - received) + (started - normalized))
+        if errors:
+            VALIDATION_FAILURES.inc(len(errors))
+
+        n_rows = len(frame)
+        predictions = np.full(n_rows, -1, dtype=np.int64)
+        probabilities = np.full(n_rows, np.nan)
+
+        valid = np.ones(n_rows, dtype=bool)
+        valid[list(errors)] = False
+
+        # Small batches (e.g. micro-batched single requests) check the score
+        # cache row by row and only score the misses
+        cache_keys = {}
+        cache_hits = set()
+        if self.score_cache is not None and n_rows <= CACHE_MAX_BATCH_ROWS:
+            for row in np.flatnonzero(valid):
+                key = self._cache_key(X[row], threshold)
+                cached = self.score_cache.get(key)
+                if cached is None:
+                    cache_keys[row] = key
+                else:
+                    predictions[row], probabilities[row] = cached
+                    valid[row] = False
+                    cache_hits.add(int(row))
+
+        if valid.any():
+            started = time.perf_counter()
+            features_scaled = self._transform(X[valid])
+            started = _SCALE_SECONDS.observe_since(started)
+
+            predictions[valid], probabilities[valid] = self._score(features_scaled, threshold)
+            _FOREST_SECONDS.observe_since(started)
+            for row, key in cache_keys.items():
+                self.score_cache.put(key, (int(predictions[row]), float(probabilities[row])))
+
+        if request_ids is not None:
+            elapsed = time.perf_counter() - received
+            for row, request_id in enumerate(request_ids):
+                if row in errors:
+                    decision_log.failure(request_id, self.version, errors[row], elapsed)
+                else:
+                    decision_log.decision(request_id, self.version, X[row], predictions[row], probabilities[row],
+                                          elapsed, cached=row in cache_hits, threshold=threshold)
+
+        return predictions, probabilities, errors
+
+    def synthetic_batch(self, n_rows, seed=0):
+        """Plausible applicants drawn from the encoder classes and the scaler's feature statistics"""
+        if not self._loaded:
+            self.load()
+        rng = np.random.default_rng(seed)
+        columns = {}
+        for idx, col in enumerate(FEATURE_ORDER):
+            if col in NUMERIC_COLS:
+                columns[col] = np.abs(rng.normal(self.scaler.mean_[idx], self.scaler.scale_[idx], n_rows))
+            else:
+                classes = np.asarray(self.categorical_lookups[col].classes, dtype=object)
+                columns[col] = classes[rng.integers(0, len(classes), n_rows)]
+        return pd.DataFrame(columns)
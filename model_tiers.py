@@ -0,0 +1,228 @@
+"""
+Build reduced "tier" models from model.pkl and report what they cost and what they lose.
+
+    python model_tiers.py --data dataset/train.csv --first-k 50 100 250 --greedy 50 \
+        --distill gbm tree --save-fast first_100
+
+Candidates are built and scored only on rows the forest never trained
+on: by default the holdout part of --data, found by replaying train.py's
+preprocessing and split (pass the --seed and --max-rows the model was
+trained with), or a separate --holdout CSV. Half of those rows select
+greedy trees and fit distilled models, the other half measure AUC,
+fidelity to the full forest, single-row and batch latency and serialized
+size. The report is written as JSON; --save-fast writes the chosen
+candidate to model_fast.pkl, which LoanPredictor(tier='fast') then loads.
+"""
+import argparse
+import copy
+import json
+import pickle
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeRegressor
+
+import train
+
+from forest_engine import CompiledForest, DistilledClassifier
+from model import LoanPredictor, FEATURE_ORDER, CATEGORICAL_COLS, TIERS
+from train import TARGET
+
+
+def approval_proba(model, X):
+    """Class-1 probability the way LoanPredictor reads it"""
+    proba = model.predict_proba(X)
+    return proba[:, 0] if proba.shape[1] == 1 else proba[:, 1]
+
+
+def first_k_trees(model, k):
+    """The forest truncated to its first k estimators"""
+    reduced = copy.copy(model)
+    reduced.estimators_ = model.estimators_[:k]
+    reduced.n_estimators = len(reduced.estimators_)
+    return reduced
+
+
+def _auc_per_row(scores, y):
+    """ROC AUC of every row of scores against y, via the rank-sum formula"""
+    positives = y == 1
+    n_pos, n_neg = positives.sum(), (~positives).sum()
+    if n_pos == 0 or n_neg == 0:
+        return np.full(scores.shape[0], np.nan)
+    ranks = rankdata(scores, axis=1)
+    return (ranks[:, positives].sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def greedy_trees(model, X, y, k):
+    """
+    Forward-select k trees, each step adding the tree that most improves the
+    AUC of the averaged probability on (X, y).
+    """
+    compiled = CompiledForest.from_sklearn(model)
+    class_col = 0 if compiled.value.shape[1] == 1 else 1
+    tree_proba = compiled.value[compiled.apply(X), class_col]  # (n_trees, n_rows)
+
+    chosen = []
+    total = np.zeros(X.shape[0])
+    available = np.ones(len(tree_proba), dtype=bool)
+    for step in range(min(k, len(tree_proba))):
+        candidates = np.flatnonzero(available)
+        auc = _auc_per_row((total + tree_proba[candidates]) / (step + 1), y)
+        best = candidates[0] if np.isnan(auc).all() else candidates[np.nanargmax(auc)]
+        chosen.append(best)
+        total += tree_proba[best]
+        available[best] = False
+
+    reduced = copy.copy(model)
+    reduced.estimators_ = [model.estimators_[i] for i in chosen]
+    reduced.n_estimators = len(reduced.estimators_)
+    return reduced
+
+
+def distill(model, X, kind='gbm'):
+    """Fit a small regressor on the forest's own probabilities for X"""
+    target = approval_proba(model, X)
+    if kind == 'gbm':
+        regressor = HistGradientBoostingRegressor(max_iter=200, max_depth=6, random_state=42)
+    elif kind == 'tree':
+        regressor = DecisionTreeRegressor(max_depth=8, random_state=42)
+    else:
+        raise ValueError(f"Unknown distillation model '{kind}'")
+    return DistilledClassifier(regressor.fit(X, target))
+
+
+def _encode_frame(predictor, frame):
+    """Encode and scale raw rows with the predictor's own encoders and scaler"""
+    X, errors = predictor._encode_batch(frame)
+    valid = np.ones(len(frame), dtype=bool)
+    valid[list(errors)] = False
+    if errors:
+        print(f"Skipped {len(errors)} rows that failed validation")
+    X_scaled = predictor.scaler.transform(pd.DataFrame(X[valid], columns=FEATURE_ORDER))
+    return X_scaled, frame[TARGET].to_numpy()[valid].astype(int)
+
+
+def load_dataset(predictor, csv_path, max_rows=None):
+    """Every row of a raw CSV, encoded and scaled"""
+    return _encode_frame(predictor, pd.read_csv(csv_path, nrows=max_rows))
+
+
+def load_training_holdout(predictor, csv_path, seed=42, max_rows=None):
+    """
+    The rows train.py held out of training when it fit the model on
+    csv_path with this seed: same loading, filtering and stratified split.
+    """
+    frame = train.fill_missing(train.load_dataset(csv_path, max_rows=max_rows))
+    frame, _ = train.iqr_filter(frame)
+    y = frame[TARGET].to_numpy().astype(np.int64)
+    # The split only depends on the row count, y and the seed, so indices match train.py's
+    _, holdout_rows = train_test_split(np.arange(len(frame)), test_size=train.TEST_SIZE, random_state=seed,
+                                       stratify=y)
+    holdout = frame.iloc[np.sort(holdout_rows)].astype({col: object for col in CATEGORICAL_COLS})
+    return _encode_frame(predictor, holdout)
+
+
+def measure(name, model, X, y, reference, repeats=50):
+    """Latency, size and accuracy of one candidate on the holdout rows"""
+    single = X[:1]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(single)
+        timings.append(time.perf_counter() - start)
+
+    batch = X[:1000]
+    start = time.perf_counter()
+    proba = approval_proba(model, batch)
+    batch_seconds = time.perf_counter() - start
+
+    proba = approval_proba(model, X) if len(X) > len(batch) else proba
+    auc = roc_auc_score(y, proba) if len(np.unique(y)) == 2 else float('nan')
+    return {
+        'name': name,
+        'n_estimators': len(getattr(model, 'estimators_', [])) or None,
+        'single_row_ms': float(np.median(timings) * 1000),
+        'batch_1000_ms': batch_seconds * 1000,
+        'size_bytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        'auc': float(auc),
+        'mean_abs_diff_vs_full': float(np.mean(np.abs(proba - reference))),
+    }
+
+
+def build_report(predictor, csv_path, first_k=(), greedy=(), distill_kinds=(), max_rows=None, seed=42,
+                 holdout_path=None):
+    """Build every requested candidate and measure it; returns (report, candidates)"""
+    if holdout_path:
+        X, y = load_dataset(predictor, holdout_path, max_rows)
+    else:
+        X, y = load_training_holdout(predictor, csv_path, seed, max_rows)
+    print(f"Building and scoring candidates on {len(X)} held-out rows")
+    order = np.random.default_rng(seed).permutation(len(X))
+    split = len(X) // 2
+    fit_rows, holdout_rows = order[:split], order[split:]
+    X_fit, y_fit = X[fit_rows], y[fit_rows]
+    X_holdout, y_holdout = X[holdout_rows], y[holdout_rows]
+
+    full = predictor.model
+    candidates = {'full': full}
+    for k in first_k:
+        candidates[f'first_{k}'] = first_k_trees(full, k)
+    for k in greedy:
+        print(f"Selecting {k} trees greedily...")
+        candidates[f'greedy_{k}'] = greedy_trees(full, X_fit, y_fit, k)
+    for kind in distill_kinds:
+        print(f"Distilling into {kind}...")
+        candidates[f'distilled_{kind}'] = distill(full, X_fit, kind)
+
+    reference = approval_proba(full, X_holdout)
+    report = [measure(name, model, X_holdout, y_holdout, reference) for name, model in candidates.items()]
+    return report, candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and compare reduced model tiers")
+    parser.add_argument('--data', default=None,
+                        help="Raw CSV the model was trained on with train.py; its holdout split is used")
+    parser.add_argument('--holdout', default=None, help="Raw CSV of rows the model never trained on")
+    parser.add_argument('--seed', type=int, default=42, help="train.py's --seed for the model")
+    parser.add_argument('--max-rows', type=int, default=None)
+    parser.add_argument('--first-k', type=int, nargs='*', default=[100])
+    parser.add_argument('--greedy', type=int, nargs='*', default=[])
+    parser.add_argument('--distill', nargs='*', default=[], choices=['gbm', 'tree'])
+    parser.add_argument('--report', default='tiers_report.json')
+    parser.add_argument('--save-fast', default=None, help="Candidate name to save as the fast tier")
+    args = parser.parse_args()
+    if not args.data and not args.holdout:
+        parser.error("Pass --data (the training CSV) or --holdout")
+
+    predictor = LoanPredictor(tier='full')
+    report, candidates = build_report(predictor, args.data, args.first_k, args.greedy,
+                                      args.distill, args.max_rows, args.seed, args.holdout)
+
+    print(f"\n{'candidate':<18}{'trees':>7}{'1 row ms':>10}{'1k rows ms':>12}{'size MB':>9}{'AUC':>8}{'|dp|':>8}")
+    for row in report:
+        print(f"{row['name']:<18}{str(row['n_estimators'] or '-'):>7}{row['single_row_ms']:>10.2f}"
+              f"{row['batch_1000_ms']:>12.1f}{row['size_bytes'] / 1e6:>9.1f}{row['auc']:>8.4f}"
+              f"{row['mean_abs_diff_vs_full']:>8.4f}")
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.report}")
+
+    if args.save_fast:
+        if args.save_fast not in candidates:
+            parser.error(f"Unknown candidate '{args.save_fast}'. Built: {list(candidates)}")
+        fast_path = Path(predictor.model_path).with_name(TIERS['fast'])
+        joblib.dump(candidates[args.save_fast], fast_path)
+        print(f"Saved '{args.save_fast}' as the fast tier to {fast_path}")
+
+
+if __name__ == '__main__':
+    main()
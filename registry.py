@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from model import LoanPredictor, TIERS, CATEGORICAL_COLS, INSTALL_MARKER, artifact_fingerprint
+from cache import ScoreCache
+
+# Process-wide defaults, so every worker picks the same engine and tier.
+# DEFAULT_TIER serves interactive requests (e.g. fast), BATCH_TIER CSV batches and jobs
+DEFAULT_ENGINE = os.getenv("LOAN_MODEL_ENGINE", "sklearn")
+DEFAULT_TIER = os.getenv("LOAN_MODEL_TIER", "full")
+BATCH_TIER = os.getenv("LOAN_BATCH_MODEL_TIER", "full")
+# Approval cut-off on the approval probability; unset keeps each model's own decision
+DECISION_THRESHOLD = os.getenv("LOAN_DECISION_THRESHOLD", "").strip() or None
+if DECISION_THRESHOLD is not None:
+    try:
+        DECISION_THRESHOLD = float(DECISION_THRESHOLD)
+    except ValueError:
+        raise ValueError(f"LOAN_DECISION_THRESHOLD must be a number in [0, 1], got '{DECISION_THRESHOLD}'")
+    if not 0.0 <= DECISION_THRESHOLD <= 1.0:
+        raise ValueError(f"LOAN_DECISION_THRESHOLD must be a number in [0, 1], got {DECISION_THRESHOLD}")
+for _name, _tier in (("LOAN_MODEL_TIER", DEFAULT_TIER), ("LOAN_BATCH_MODEL_TIER", BATCH_TIER)):
+    if _tier not in TIERS:
+        raise ValueError(f"{_name}: unknown tier '{_tier}'. Expected one of: {list(TIERS)}")
+DEFAULT_ARTIFACT_DIR = os.getenv("LOAN_MODEL_DIR", str(Path(__file__).parent))
+# Per-predictor score cache (0 entries = no cache)
+SCORE_CACHE_SIZE = int(os.getenv("LOAN_SCORE_CACHE_SIZE", "10000"))
+SCORE_CACHE_TTL_SECONDS = float(os.getenv("LOAN_SCORE_CACHE_TTL_SECONDS", "300"))
+
+# Synthetic rows a new predictor must score cleanly before it is swapped in
+WARMUP_ROWS = 32
+
+
+class ModelRegistry:
+    """
+    Hands out one shared LoanPredictor per engine/tier for the active artifact set.
+
+    Predictors are created lazily, so nothing is unpickled until the first
+    prediction that needs it. A new artifact set is picked up by reload()
+    (or the watch() thread): the replacement is loaded, validated and warmed
+    in the background and then swapped in with a single reference
+    assignment. Callers hold on to the predictor they got from get(), so
+    in-flight requests finish on the old version while new ones use the new.
+    """
+
+    def __init__(self, artifact_dir=DEFAULT_ARTIFACT_DIR):
+        self.artifact_dir = str(artifact_dir)
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._predictors = {}
+        self._watcher = None
+        self.last_reload = None
+        self.last_error = None
+        self._failed_version = None
+
+    def version(self, artifact_dir=None, tier=DEFAULT_TIER):
+        """Fingerprint of the artifact set a predictor for artifact_dir/tier would load"""
+        artifact_dir = Path(artifact_dir or self.artifact_dir)
+        paths = [artifact_dir / TIERS[tier], artifact_dir / 'scaler.pkl', artifact_dir / 'label_encoders.pkl']
+        paths = [p for p in paths if p.exists()]
+        return artifact_fingerprint(*paths) if paths else None
+
+    def install_pending(self, artifact_dir=None):
+        """True while train.py --install is still swapping files into artifact_dir"""
+        artifact_dir = Path(artifact_dir or self.artifact_dir)
+        try:
+            installing = (artifact_dir / INSTALL_MARKER).read_text().strip()
+        except FileNotFoundError:
+            return False
+        return installing != self.version(artifact_dir, tier='full')
+
+    def _new_predictor(self, engine, tier, artifact_dir):
+        # Every predictor gets its own cache, so a reload never serves stale scores
+        score_cache = ScoreCache(SCORE_CACHE_SIZE, SCORE_CACHE_TTL_SECONDS) if SCORE_CACHE_SIZE > 0 else None
+        return LoanPredictor(decision_threshold=DECISION_THRESHOLD, engine=engine, tier=tier,
+                             artifact_dir=artifact_dir, lazy=True, score_cache=score_cache)
+
+    def get(self, engine=DEFAULT_ENGINE, tier=DEFAULT_TIER):
+        """Return the active shared predictor for engine/tier"""
+        config = (engine, tier)
+        predictor = self._predictors.get(config)
+        if predictor is None:
+            with self._lock:
+                predictor = self._predictors.get(config)
+                if predictor is None:
+                    predictor = self._new_predictor(engine, tier, self.artifact_dir)
+                    self._predictors[config] = predictor
+        return predictor
+
+    def _validate(self, predictor):
+        """Raise ValueError unless predictor loaded fully and scores synthetic rows sanely"""
+        predictor.load()
+        if predictor.forest is None or predictor.scaler is None:
+            raise ValueError("Model or scaler failed to load")
+        missing = [col for col in CATEGORICAL_COLS if col not in predictor.categorical_lookups]
+        if missing:
+            raise ValueError(f"No encoders for {missing}")
+
+        # Warm both scoring paths while checking the output
+        batch = predictor.synthetic_batch(WARMUP_ROWS)
+        predictions, probabilities, errors = predictor.predict_many(batch)
+        if errors:
+            raise ValueError(f"Warm-up rows failed validation: {next(iter(errors.values()))}")
+        if not np.all((probabilities >= 0) & (probabilities <= 1)):
+            raise ValueError("Warm-up probabilities fall outside [0, 1]")
+        for idx in range(min(3, WARMUP_ROWS)):
+            predictor.predict_single(batch.iloc[idx].to_dict())
+
+    def reload(self, artifact_dir=None, wait=False):
+        """
+        Load the artifact set in artifact_dir (default: the current one) for
+        every active engine/tier, validate and warm it, then swap it in.
+        Runs in a background thread unless wait=True; returns the thread or,
+        when waiting, whether the swap happened.
+        """
+        if not wait:
+            thread = threading.Thread(target=self._reload, args=(artifact_dir,),
+                                      name="model-reload", daemon=True)
+            thread.start()
+            return thread
+        return self._reload(artifact_dir)
+
+    def _reload(self, artifact_dir):
+        artifact_dir = str(artifact_dir or self.artifact_dir)
+        with self._reload_lock:
+            if self.install_pending(artifact_dir):
+                print(f"Install into {artifact_dir} in progress, keeping the current model")
+                return False
+            installed = self.version(artifact_dir, tier='full')
+            configs = list(self._predictors) or [(DEFAULT_ENGINE, DEFAULT_TIER)]
+            try:
+                candidates = {}
+                for engine, tier in configs:
+                    candidate = self._new_predictor(engine, tier, artifact_dir)
+                    # Validate the scoring paths themselves, not cache hits
+                    score_cache, candidate.score_cache = candidate.score_cache, None
+                    self._validate(candidate)
+                    candidate.score_cache = score_cache
+                    candidates[(engine, tier)] = candidate
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {str(e)}"
+                self._failed_version = self.version(artifact_dir)
+                print(f"Model reload from {artifact_dir} failed, keeping the current model: {self.last_error}")
+                return False
+            # An install that started (or finished) mid-load may have left us a mix of versions
+            if self.install_pending(artifact_dir) or self.version(artifact_dir, tier='full') != installed:
+                print(f"Artifacts in {artifact_dir} changed while loading, keeping the current model")
+                return False
+
+            with self._lock:
+                self.artifact_dir = artifact_dir
+                self._predictors.update(candidates)
+            self.last_reload = time.time()
+            self.last_error = None
+            versions = sorted({p.version for p in candidates.values()})
+            print(f"Model reloaded from {artifact_dir}, now serving version {', '.join(map(str, versions))}")
+            return True
+
+    def watch(self, interval=5.0):
+        """Poll the artifact files and reload whenever their content changes"""
+        if self._watcher is not None:
+            return self._watcher
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.install_pending():
+                        continue
+                    for (engine, tier), predictor in list(self._predictors.items()):
+                        version = self.version(tier=tier)
+                        if (predictor._loaded and version != predictor.version
+                                and version != self._failed_version):
+                            self.reload(wait=True)
+                            break
+                except Exception as e:
+                    print(f"Model watcher error: {str(e)}")
+
+        self._watcher = threading.Thread(target=poll, name="model-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def status(self):
+        """Active versions and the outcome of the last reload"""
+        return {
+            "artifact_dir": self.artifact_dir,
+            "decision_threshold": DECISION_THRESHOLD,
+            "models": [
+                {"engine": engine, "tier": tier, "version": predictor.version, "loaded": predictor._loaded,
+                 "score_cache": predictor.score_cache.stats() if predictor.score_cache is not None else None}
+                for (engine, tier), predictor in self._predictors.items()
+            ],
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+        }
+
+
+# Shared registry for the process
+registry = ModelRegistry()
+
+def get_predictor(engine=DEFAULT_ENGINE, tier=DEFAULT_TIER):
+    """Shared predictor from the process-wide registry"""
+    return registry.get(engine=engine, tier=tier)
@@ -0,0 +1,303 @@
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import STAGE_SECONDS
+
+DB_PATH = os.getenv("LOAN_DB_PATH", "loan_db.sqlite3")
+# full: wait for a commit synced to disk; normal: wait for the commit, WAL
+# synced at checkpoints (survives a process crash, not a power cut);
+# async: return once queued, committed by the writer shortly after
+DURABILITY = os.getenv("LOAN_DB_DURABILITY", "normal")
+DURABILITY_MODES = ("full", "normal", "async")
+# How long the writer lingers for more rows before committing (0 = commit what is queued)
+COMMIT_INTERVAL_MS = float(os.getenv("LOAN_DB_COMMIT_INTERVAL_MS", "0"))
+CACHE_SIZE_KB = int(os.getenv("LOAN_DB_CACHE_KB", "65536"))
+BUSY_TIMEOUT_MS = int(os.getenv("LOAN_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# predictions table columns, in table order
+PREDICTION_COLUMNS = [
+    "id", "user_id", "name", "annual_income", "debt_to_income_ratio", "credit_score",
+    "loan_amount", "interest_rate", "gender", "marital_status", "education_level",
+    "employment_status", "loan_purpose", "grade_subgrade", "prediction_type",
+    "prediction", "probability", "created_at",
+]
+# Queued by PredictionWriter.close()
+_STOP = object()
+# How long write() held its caller: the commit wait, or just the enqueue for async
+_DB_WRITE_SECONDS = STAGE_SECONDS["db_write"]
+
+INSERT_PREDICTION = (
+    f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})"
+)
+
+
+def create_prediction_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS predictions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER,
+        name TEXT,
+        annual_income REAL,
+        debt_to_income_ratio REAL,
+        credit_score REAL,
+        loan_amount REAL,
+        interest_rate REAL,
+        gender TEXT,
+        marital_status TEXT,
+        education_level TEXT,
+        employment_status TEXT,
+        loan_purpose TEXT,
+        grade_subgrade TEXT,
+        prediction_type TEXT,
+        prediction INTEGER,
+        probability REAL,
+        created_at TEXT
+    )
+    """)
+    # Per-user history newest first; id breaks ties between rows of one batch
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_predictions_user_created ON predictions (user_id, created_at, id)")
+
+
+def encode_cursor(created_at, prediction_id):
+    """Opaque keyset cursor for the row (created_at, id)"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, prediction_id]).encode()).decode()
+
+
+def decode_cursor(token):
+    """(created_at, id) from encode_cursor; raises ValueError for anything else"""
+    try:
+        created_at, prediction_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, prediction_id
+
+
+def fetch_predictions(db, user_id, columns, limit, after=None, start=None, end=None, prediction=None):
+    """
+    One page of a user's predictions, newest first.
+
+    Walks ix_predictions_user_created from the cursor position instead of
+    using an OFFSET, so every page costs the same however deep it is.
+    start/end bound created_at (ISO strings, end exclusive) and prediction
+    keeps only one decision. Returns (rows as tuples of columns, next
+    cursor or None on the last page).
+    """
+    where, params = ["user_id=?"], [user_id]
+    if start is not None:
+        where.append("created_at>=?")
+        params.append(start)
+    if end is not None:
+        where.append("created_at<?")
+        params.append(end)
+    if prediction is not None:
+        where.append("prediction=?")
+        params.append(prediction)
+    if after is not None:
+        where.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(after))
+    rows = db.execute(
+        f"SELECT {', '.join(columns)}, created_at, id FROM predictions WHERE {' AND '.join(where)} "
+        "ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1),
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return [row[:-2] for row in rows], next_cursor
+
+
+class Database:
+    """
+    SQLite access with one connection per thread.
+
+    Every connection runs in WAL mode, so readers never block the writer
+    and vice versa, with a page cache and busy timeout sized for a server
+    rather than the sqlite3 defaults.
+    """
+
+    def __init__(self, path=DB_PATH, synchronous="NORMAL", cache_size_kb=CACHE_SIZE_KB,
+                 busy_timeout_ms=BUSY_TIMEOUT_MS):
+        self.path = path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+
+    def connect(self, synchronous=None):
+        """Open a new tuned connection (the caller owns it)"""
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous or self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @property
+    def conn(self):
+        """This thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+        return conn
+
+    def execute(self, sql, params=()):
+        """Run one statement on this thread's connection and return the cursor"""
+        return self.conn.execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """Commit on success, roll back on error"""
+        conn = self.conn
+        with conn:
+            yield conn
+
+
+class PredictionWriter:
+    """
+    Background thread that owns every insert into the predictions table.
+
+    write() queues rows; the writer drains whatever has queued up (after
+    lingering commit_interval_ms for more, if set) and stores it with one
+    executemany in one transaction, so concurrent requests share a commit
+    and its fsync instead of paying for one each. Unless durability is
+    'async', write() returns only once its rows are committed and raises
+    if the insert failed. after_insert(conn, rows), if given, runs inside
+    the same transaction as every insert (see analytics.update_rollups).
+    """
+
+    def __init__(self, db, durability=DURABILITY, commit_interval_ms=COMMIT_INTERVAL_MS, max_batch_rows=10000,
+                 after_insert=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability '{durability}'. Expected one of: {list(DURABILITY_MODES)}")
+        self.db = db
+        self.durability = durability
+        self.commit_interval = commit_interval_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.after_insert = after_insert
+        self.commits = 0
+        self.rows_written = 0
+        self.failed_rows = 0
+        self.last_error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, rows, wait=None):
+        """Store prediction rows (tuples in PREDICTION_COLUMNS order)"""
+        rows = list(rows)
+        if not rows:
+            return
+        if wait is None:
+            wait = self.durability != "async"
+        started = time.perf_counter()
+        item = {"rows": rows, "done": threading.Event() if wait else None, "error": None}
+        self._queue.put(item)
+        if wait:
+            item["done"].wait()
+        _DB_WRITE_SECONDS.observe_since(started)
+        if item["error"] is not None:
+            raise item["error"]
+
+    def flush(self):
+        """Wait until everything queued so far is committed"""
+        item = {"rows": [], "done": threading.Event(), "error": None}
+        self._queue.put(item)
+        item["done"].wait()
+
+    def call(self, fn):
+        """
+        Run fn(conn) in one transaction on the writer thread, after everything
+        queued so far and before anything queued later; returns its result.
+        """
+        item = {"rows": [], "call": fn, "done": threading.Event(), "error": None, "result": None}
+        self._queue.put(item)
+        item["done"].wait()
+        if item["error"] is not None:
+            raise item["error"]
+        return item["result"]
+
+    def close(self):
+        """Commit what is queued and stop the writer"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        return {"durability": self.durability, "queued": self._queue.qsize(), "commits": self.commits,
+                "rows_written": self.rows_written, "failed_rows": self.failed_rows,
+                "last_error": self.last_error}
+
+    def _next_batch(self, first):
+        """Gather queued writes after first; returns them and the item that ended the batch, if any"""
+        batch, n_rows = [first], len(first["rows"])
+        deadline = time.monotonic() + self.commit_interval
+        while n_rows < self.max_batch_rows:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP or "call" in item:
+                return batch, item
+            batch.append(item)
+            n_rows += len(item["rows"])
+        return batch, None
+
+    def _insert(self, conn, rows):
+        with conn:
+            conn.executemany(INSERT_PREDICTION, rows)
+            if self.after_insert is not None:
+                self.after_insert(conn, rows)
+
+    def _call(self, conn, item):
+        try:
+            with conn:
+                item["result"] = item["call"](conn)
+        except Exception as e:
+            item["error"] = e
+        item["done"].set()
+
+    def _run(self):
+        conn = self.db.connect(synchronous="FULL" if self.durability == "full" else None)
+        following = None
+        while True:
+            first = following if following is not None else self._queue.get()
+            following = None
+            if first is _STOP:
+                break
+            if "call" in first:
+                self._call(conn, first)
+                continue
+            batch, following = self._next_batch(first)
+            rows = [row for item in batch for row in item["rows"]]
+            try:
+                if rows:
+                    self._insert(conn, rows)
+                    self.commits += 1
+                    self.rows_written += len(rows)
+            except Exception:
+                # Retry row groups one by one so one bad request doesn't fail the others
+                for item in batch:
+                    try:
+                        self._insert(conn, item["rows"])
+                        self.rows_written += len(item["rows"])
+                    except Exception as item_error:
+                        item["error"] = item_error
+                        self.failed_rows += len(item["rows"])
+                        self.last_error = f"{type(item_error).__name__}: {str(item_error)}"
+                        if item["done"] is None:
+                            print(f"Dropped {len(item['rows'])} prediction rows: {self.last_error}")
+                self.commits += 1
+            for item in batch:
+                if item["done"] is not None:
+                    item["done"].set()
+        conn.close()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Cheap bcrypt for tests; hashing.py reads this at import
+os.environ.setdefault("LOAN_BCRYPT_ROUNDS", "4")
@@ -0,0 +1,84 @@
+"""Prediction rollups: normalized buckets, and rebuilds that match incremental updates"""
+import sqlite3
+
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from analytics import create_rollup_table, read_rollups, read_summary, rebuild_rollups, update_rollups
+from encoding import compile_lookups
+from storage import INSERT_PREDICTION, create_prediction_table
+
+LOOKUPS = compile_lookups({
+    "loan_purpose": LabelEncoder().fit(["Debt consolidation", "Home", "Other"]),
+    "grade_subgrade": LabelEncoder().fit(["A1", "B2"]),
+})
+# (user_id, loan_purpose, grade_subgrade, prediction, probability, created_at)
+APPLICATIONS = [
+    (1, "Home", "A1", 1, 0.91, "2026-10-01T08:00:00"),
+    (1, "home improvement", "a1", 1, 0.72, "2026-10-01T09:30:00"),
+    (1, "HOME", " A1 ", 0, 0.35, "2026-10-02T10:00:00"),
+    (1, "Debt consolidation", "B2", 0, 0.05, "2026-10-02T11:00:00"),
+    (1, "debt_consolidation", "b2", 1, 1.0, "2026-10-03T12:00:00"),
+    (1, "Vacation", "Z9", 0, 0.5, "2026-10-03T13:00:00"),
+    (2, "Home", "A1", 1, 0.8, "2026-10-01T08:00:00"),
+]
+
+
+def prediction_rows():
+    return [
+        (f"p{i}", user_id, "applicant", 50000.0, 0.2, 700.0, 10000.0, 12.5, "Male", "Single",
+         "Bachelor's", "Employed", purpose, grade, "single", prediction, probability, created_at)
+        for i, (user_id, purpose, grade, prediction, probability, created_at) in enumerate(APPLICATIONS)
+    ]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_prediction_table(conn)
+    create_rollup_table(conn)
+    rows = prediction_rows()
+    conn.executemany(INSERT_PREDICTION, rows)
+    # Two insert batches, as the writer would fold them
+    update_rollups(conn, rows[:3], LOOKUPS)
+    update_rollups(conn, rows[3:], LOOKUPS)
+    yield conn
+    conn.close()
+
+
+def buckets(conn, user_id, dimension):
+    return {row["bucket"]: row for row in read_rollups(conn, user_id, dimension)}
+
+
+def test_spellings_share_the_encoder_class_bucket(conn):
+    purposes = buckets(conn, 1, "loan_purpose")
+    assert {bucket: row["n"] for bucket, row in purposes.items()} == {
+        "Debt consolidation": 2, "Home": 3, "Vacation": 1,
+    }
+    assert purposes["Home"]["approved"] == 2
+    assert purposes["Home"]["mean_probability"] == pytest.approx((0.91 + 0.72 + 0.35) / 3)
+    assert purposes["Debt consolidation"]["histogram"] == [1] + [0] * 8 + [1]
+
+    grades = buckets(conn, 1, "grade_subgrade")
+    assert {bucket: row["n"] for bucket, row in grades.items()} == {"A1": 3, "B2": 2, "Z9": 1}
+
+
+def test_summary_and_day_range(conn):
+    assert read_summary(conn, 1)["n"] == 6
+    assert read_summary(conn, 1, start="2026-10-02", end="2026-10-02")["n"] == 2
+    assert read_summary(conn, 2)["approved"] == 1
+
+
+@pytest.mark.parametrize("user_id", [None, 1])
+def test_rebuild_matches_incremental_rollups(conn, user_id):
+    before = conn.execute("SELECT * FROM prediction_rollups ORDER BY 1, 2, 3").fetchall()
+    rebuild_rollups(conn, user_id, LOOKUPS, chunk_rows=2)
+    after = conn.execute("SELECT * FROM prediction_rollups ORDER BY 1, 2, 3").fetchall()
+
+    assert [row[:5] + row[6:] for row in after] == [row[:5] + row[6:] for row in before]
+    assert [row[5] for row in after] == pytest.approx([row[5] for row in before])
+
+
+def test_without_lookups_buckets_are_raw_values(conn):
+    rebuild_rollups(conn, 1)
+    assert buckets(conn, 1, "loan_purpose")["home improvement"]["n"] == 1
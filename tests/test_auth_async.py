@@ -0,0 +1,162 @@
+"""auth.py helpers on the async engine, against SQLite through aiosqlite"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+pytest.importorskip("aiosqlite")
+
+import auth
+from database import Base, User
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Run scenario(sessions) on a fresh SQLite database, sessions made like database.AsyncSessionLocal"""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}"
+    if auth.token_cache is not None:
+        auth.token_cache.clear()
+
+    def run(scenario):
+        async def main():
+            engine = create_async_engine(url)
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            sessions = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            try:
+                return await scenario(sessions)
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+
+    return run
+
+
+async def add_user(sessions, password="correct horse"):
+    async with sessions() as db:
+        return await auth.create_user(db, "ada@example.com", "ada", password, full_name="Ada")
+
+
+def test_create_user_is_committed(run):
+    async def scenario(sessions):
+        created = await add_user(sessions)
+        async with sessions() as db:
+            by_name = await auth.get_user_by_username(db, "ada")
+            by_email = await auth.get_user_by_email(db, "ada@example.com")
+            missing = await auth.get_user_by_username(db, "bob")
+        return created, by_name, by_email, missing
+
+    created, by_name, by_email, missing = run(scenario)
+    assert created.id is not None and created.is_active and not created.is_verified
+    assert by_name.id == by_email.id == created.id
+    assert by_name.hashed_password != "correct horse"
+    assert missing is None
+
+
+def test_authenticate_by_username_or_email(run):
+    async def scenario(sessions):
+        await add_user(sessions)
+        async with sessions() as db:
+            return [
+                await auth.authenticate_user(db, "ada", "correct horse"),
+                await auth.authenticate_user(db, "ada@example.com", "correct horse"),
+                await auth.authenticate_user(db, "ada", "wrong"),
+                await auth.authenticate_user(db, "bob", "correct horse"),
+            ]
+
+    by_name, by_email, wrong_password, unknown = run(scenario)
+    assert by_name.username == by_email.username == "ada"
+    assert wrong_password is None and unknown is None
+
+
+def test_authenticate_upgrades_hash_with_another_cost(run):
+    rounds = auth.password_hasher.rounds
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds + 1)
+
+    async def scenario(sessions):
+        user = await add_user(sessions)
+        async with sessions() as db:
+            stored = await db.get(User, user.id)
+            stored.hashed_password = old_context.hash(auth._prehash("correct horse"))
+            await db.commit()
+        async with sessions() as db:
+            assert await auth.authenticate_user(db, "ada", "correct horse") is not None
+        async with sessions() as db:
+            return (await db.get(User, user.id)).hashed_password
+
+    upgraded = run(scenario)
+    assert old_context.identify(upgraded) == "bcrypt"
+    assert upgraded.split("$")[2] == f"{rounds:02d}"
+    assert auth.verify_password("correct horse", upgraded)
+
+
+def test_reset_password_flow(run):
+    async def scenario(sessions):
+        await add_user(sessions)
+        async with sessions() as db:
+            user = await auth.get_user_by_username(db, "ada")
+            token = await auth.set_reset_token(db, user)
+        async with sessions() as db:
+            user = await auth.verify_reset_token(db, token)
+            assert user is not None and user.username == "ada"
+            await auth.reset_password(db, user, "battery staple")
+        async with sessions() as db:
+            return [
+                await auth.verify_reset_token(db, token),
+                await auth.authenticate_user(db, "ada", "correct horse"),
+                await auth.authenticate_user(db, "ada", "battery staple"),
+            ]
+
+    reused_token, old_password, new_password = run(scenario)
+    assert reused_token is None and old_password is None
+    assert new_password is not None and new_password.reset_token is None
+
+
+def test_expired_reset_token_is_cleared(run):
+    async def scenario(sessions):
+        await add_user(sessions)
+        async with sessions() as db:
+            user = await auth.get_user_by_username(db, "ada")
+            token = await auth.set_reset_token(db, user)
+            user.reset_token_expiry = datetime.utcnow() - timedelta(minutes=1)
+            await db.commit()
+        async with sessions() as db:
+            assert await auth.verify_reset_token(db, token) is None
+        async with sessions() as db:
+            return await auth.get_user_by_username(db, "ada")
+
+    user = run(scenario)
+    assert user.reset_token is None and user.reset_token_expiry is None
+
+
+def test_current_user_from_token_and_deactivation(run):
+    token = auth.create_access_token({"sub": "ada"})
+    stranger = auth.create_access_token({"sub": "bob"})
+
+    async def scenario(sessions):
+        await add_user(sessions)
+        async with sessions() as db:
+            first = await auth.get_current_user(token, db)
+        async with sessions() as db:
+            # Served from the token cache (when on), attached to this session
+            second = await auth.get_current_user(token, db)
+            assert await auth.get_current_active_user(second) is second
+            await auth.deactivate_user(db, second)
+        async with sessions() as db:
+            third = await auth.get_current_user(token, db)
+            with pytest.raises(HTTPException) as inactive:
+                await auth.get_current_active_user(third)
+            with pytest.raises(HTTPException) as unknown:
+                await auth.get_current_user(stranger, db)
+            with pytest.raises(HTTPException) as garbage:
+                await auth.get_current_user("not-a-jwt", db)
+        return first, third, inactive.value, unknown.value, garbage.value
+
+    first, third, inactive, unknown, garbage = run(scenario)
+    assert first.username == third.username == "ada"
+    assert first.is_active and not third.is_active
+    assert inactive.status_code == 400
+    assert unknown.status_code == garbage.status_code == 401
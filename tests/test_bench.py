@@ -0,0 +1,59 @@
+"""bench.py refuses regression checks against a baseline from a different setup"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import bench
+
+REPO = Path(__file__).resolve().parent.parent
+QUICK = ["--stages", "scale", "--sizes", "10", "--min-time", "0.01", "--max-repeats", "3"]
+
+
+def run_bench(*args):
+    return subprocess.run([sys.executable, str(REPO / "bench.py"), *QUICK, *map(str, args)],
+                          capture_output=True, text=True, cwd=REPO)
+
+
+@pytest.fixture(scope="module")
+def baseline(tmp_path_factory):
+    path = tmp_path_factory.mktemp("bench") / "baseline.json"
+    result = run_bench("--output", path)
+    assert result.returncode == 0, result.stderr
+    return json.loads(path.read_text())
+
+
+def test_mismatch_names_each_differing_setting():
+    meta = {"engine": "sklearn", "tier": "full", "model_version": "abc", "durability": "normal"}
+    assert bench.baseline_mismatch(meta, {"meta": dict(meta)}) == {}
+    assert bench.baseline_mismatch(meta, {"meta": {**meta, "tier": "fast", "model_version": "def"}}) == {
+        "tier": ("fast", "full"), "model_version": ("def", "abc")}
+    assert set(bench.baseline_mismatch(meta, {"results": []})) == set(bench.BASELINE_KEYS)
+
+
+@pytest.mark.parametrize("key, value", [("engine", "compiled"), ("tier", "fast"), ("model_version", "0000")])
+def test_mismatched_baseline_is_refused(tmp_path, baseline, key, value):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({**baseline, "meta": {**baseline["meta"], key: value}}))
+
+    refused = run_bench("--baseline", path)
+    assert refused.returncode == 2
+    assert "not comparable" in refused.stderr and key in refused.stderr
+
+    output = tmp_path / "run.json"
+    allowed = run_bench("--baseline", path, "--allow-baseline-mismatch", "--output", output)
+    assert allowed.returncode in (0, 1)
+    assert "WARNING" in allowed.stderr
+    assert json.loads(output.read_text())["baseline"]["mismatch"] == {key: [value, baseline["meta"][key]]}
+
+
+def test_matching_baseline_is_compared(tmp_path, baseline):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(baseline))
+    output = tmp_path / "run.json"
+    result = run_bench("--baseline", path, "--tolerance", "1000", "--output", output)
+    assert result.returncode == 0, result.stderr
+    assert "WARNING" not in result.stderr
+    assert json.loads(output.read_text())["baseline"]["mismatch"] == {}
@@ -0,0 +1,80 @@
+"""/predictions/export over HTTP, including resuming a truncated download"""
+import csv
+import io
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import INSERT_PREDICTION, PREDICTION_COLUMNS
+
+USER_ID = 7
+N_ROWS = 250
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # backend opens its SQLite database and job directory relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("backend"))
+    try:
+        import backend
+        rows = [
+            (f"p{i:04d}", USER_ID, f"applicant {i}", 50000.0 + i, 0.2, 700.0, 10000.0, 12.5, "Male", "Single",
+             "PhD", "Employed", "Car", "A1", "batch", i % 2, i / N_ROWS,
+             # Rows of one batch share created_at; id orders them
+             f"2026-10-{1 + i // 50:02d}T08:00:00")
+            for i in range(N_ROWS)
+        ]
+        with backend.db.transaction() as conn:
+            conn.executemany(INSERT_PREDICTION, rows)
+            conn.executemany(INSERT_PREDICTION, [(f"other{i}", USER_ID + 1, *row[2:]) for i, row in enumerate(rows)])
+        backend.app.dependency_overrides[backend.get_current_user] = lambda: (USER_ID, "u", "e", "p")
+        yield TestClient(backend.app)
+        backend.app.dependency_overrides.clear()
+    finally:
+        os.chdir(cwd)
+
+
+def ndjson_rows(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def csv_rows(body):
+    return list(csv.DictReader(io.StringIO(body)))
+
+
+@pytest.mark.parametrize("fmt, parse", [("ndjson", ndjson_rows), ("csv", csv_rows)])
+@pytest.mark.parametrize("cut", [0.3, 0.75])
+def test_truncated_export_resumes_after_last_complete_row(client, fmt, parse, cut):
+    full = client.get("/predictions/export", params={"format": fmt})
+    assert full.status_code == 200
+    expected = parse(full.text)
+    assert len(expected) == N_ROWS
+
+    # The connection drops part way through a line; keep only complete lines
+    received = full.text[:int(len(full.text) * cut)]
+    received = received[:received.rindex("\n") + 1]
+    partial = parse(received)
+    last = partial[-1]
+
+    resumed = client.get("/predictions/export", params={
+        "format": fmt, "after_created_at": last["created_at"], "after_id": last["id"]})
+    assert resumed.status_code == 200
+    assert 0 < len(partial) < N_ROWS
+    assert partial + parse(resumed.text) == expected
+
+
+@pytest.mark.parametrize("params", [
+    {"after_id": "p0100"},
+    {"after_created_at": "2026-10-03T08:00:00"},
+    {"after_created_at": "2026-10-03T08:00:00", "after_id": "p0100", "cursor": "abc"},
+])
+def test_resume_parameters_are_validated(client, params):
+    assert client.get("/predictions/export", params=params).status_code == 400
+
+
+def test_columns_match_predictions_table(client):
+    header = client.get("/predictions/export", params={"format": "csv"}).text.splitlines()[0]
+    assert header.split(",") == PREDICTION_COLUMNS
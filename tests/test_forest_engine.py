@@ -0,0 +1,175 @@
+"""Parity of the compiled and fused forest engines with RandomForestClassifier.predict_proba"""
+import re
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+import model
+from forest_engine import CompiledForest, check_parity, fuse_scaler, random_inputs
+from model import CATEGORICAL_COLS, FEATURE_ORDER, LoanPredictor
+
+N_FEATURES = len(FEATURE_ORDER)
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    X, y = make_classification(n_samples=2000, n_features=N_FEATURES, n_informative=7, random_state=0)
+    # Raw features on scales like the application fields, so the scaler matters
+    X = X * np.linspace(1.0, 5000.0, N_FEATURES) + np.linspace(0.0, 40000.0, N_FEATURES)
+    scaler = StandardScaler().fit(pd.DataFrame(X, columns=FEATURE_ORDER))
+    return X, y, scaler
+
+
+def fit_forest(dataset, **params):
+    X, y, scaler = dataset
+    params = {"n_estimators": 40, "random_state": 0, **params}
+    return RandomForestClassifier(**params).fit(scaler.transform(pd.DataFrame(X, columns=FEATURE_ORDER)), y)
+
+
+def raw_inputs(dataset, n_rows=500, seed=1):
+    """Rows around and beyond the training range, plus rows sitting exactly on split points"""
+    X, _, _ = dataset
+    rng = np.random.default_rng(seed)
+    rows = X[rng.integers(0, len(X), n_rows)] * rng.uniform(0.5, 1.5, (n_rows, N_FEATURES))
+    return np.vstack([rows, X[:50]])
+
+
+@pytest.mark.parametrize("params", [
+    {"max_depth": 1},
+    {"max_depth": 4},
+    {"max_depth": 12},
+    {"max_depth": None},
+    {"max_depth": None, "min_samples_leaf": 5, "max_features": 0.5},
+])
+def test_compiled_matches_predict_proba(dataset, params):
+    forest = fit_forest(dataset, **params)
+    compiled = CompiledForest.from_sklearn(forest)
+    X_scaled = dataset[2].transform(pd.DataFrame(raw_inputs(dataset), columns=FEATURE_ORDER))
+
+    assert compiled.max_depth == max(tree.tree_.max_depth for tree in forest.estimators_)
+    assert np.array_equal(compiled.predict_proba(X_scaled), forest.predict_proba(X_scaled))
+    assert np.array_equal(compiled.predict_proba(random_inputs(N_FEATURES)),
+                          forest.predict_proba(random_inputs(N_FEATURES)))
+    assert check_parity(forest, compiled)
+
+
+@pytest.mark.parametrize("max_depth", [3, 10, None])
+def test_fused_matches_scaler_then_predict_proba(dataset, max_depth):
+    forest = fit_forest(dataset, max_depth=max_depth)
+    scaler = dataset[2]
+    fused = fuse_scaler(CompiledForest.from_sklearn(forest), scaler)
+    X = raw_inputs(dataset)
+
+    reference = forest.predict_proba(scaler.transform(pd.DataFrame(X, columns=FEATURE_ORDER)))
+    assert np.array_equal(fused.predict_proba(X), reference)
+    assert check_parity(forest, fused, scaler=scaler)
+
+
+def test_batches_larger_than_the_traversal_budget(dataset, monkeypatch):
+    forest = fit_forest(dataset, max_depth=8)
+    compiled = CompiledForest.from_sklearn(forest)
+    X_scaled = dataset[2].transform(pd.DataFrame(raw_inputs(dataset), columns=FEATURE_ORDER))
+    monkeypatch.setattr("forest_engine.TRAVERSAL_BUDGET", forest.n_estimators * 7)
+
+    assert np.array_equal(compiled.predict_proba(X_scaled), forest.predict_proba(X_scaled))
+
+
+def test_parallel_forest_is_checked_against_estimator_order(dataset):
+    forest = fit_forest(dataset, max_depth=None, n_jobs=4)
+    compiled = CompiledForest.from_sklearn(forest)
+    X_scaled = dataset[2].transform(pd.DataFrame(raw_inputs(dataset), columns=FEATURE_ORDER))
+
+    assert check_parity(forest, compiled)
+    assert forest.n_jobs == 4  # the check must not change the caller's model
+    # Threads add trees in completion order, so only the single-threaded sum is bit-identical
+    forest.n_jobs = 1
+    assert np.array_equal(compiled.predict_proba(X_scaled), forest.predict_proba(X_scaled))
+    forest.n_jobs = 4
+    np.testing.assert_allclose(compiled.predict_proba(X_scaled), forest.predict_proba(X_scaled), rtol=0, atol=1e-12)
+
+
+def test_parity_fails_for_a_different_forest(dataset):
+    compiled = CompiledForest.from_sklearn(fit_forest(dataset, random_state=1))
+    assert not check_parity(fit_forest(dataset, random_state=2), compiled)
+
+
+@pytest.fixture
+def artifact_dir(tmp_path, dataset):
+    forest = fit_forest(dataset, max_depth=8, n_jobs=2)
+    encoders = {col: LabelEncoder().fit([f"{col}_{i}" for i in range(4)]) for col in CATEGORICAL_COLS}
+    joblib.dump(forest, tmp_path / "model.pkl")
+    joblib.dump(dataset[2], tmp_path / "scaler.pkl")
+    joblib.dump(encoders, tmp_path / "label_encoders.pkl")
+    return tmp_path
+
+
+@pytest.mark.parametrize("engine", ["compiled", "fused"])
+def test_predictor_engines_agree_with_sklearn(artifact_dir, engine):
+    reference = LoanPredictor(artifact_dir=artifact_dir)
+    reference.forest.n_jobs = 1  # sum the trees in estimator order, as the engines do
+    predictor = LoanPredictor(engine=engine, artifact_dir=artifact_dir)
+    batch = reference.synthetic_batch(200)
+
+    assert predictor.engine == engine
+    expected = reference.predict_many(batch)
+    actual = predictor.predict_many(batch)
+    assert np.array_equal(actual[0], expected[0])
+    assert np.array_equal(actual[1], expected[1])
+
+
+@pytest.mark.parametrize("engine", ["sklearn", "compiled", "fused"])
+@pytest.mark.parametrize("value, message", [
+    (float("nan"), "Missing value for annual_income"),
+    (float("inf"), "Invalid value for annual_income: 'inf'"),
+    (float("-inf"), "Invalid value for annual_income: '-inf'"),
+])
+def test_non_finite_input_is_rejected_by_every_engine(artifact_dir, engine, value, message):
+    predictor = LoanPredictor(engine=engine, artifact_dir=artifact_dir)
+    records = predictor.synthetic_batch(3).to_dict("records")
+    records[1]["annual_income"] = value
+    failures = model.VALIDATION_FAILURES.value
+
+    with pytest.raises(ValueError, match=re.escape(message)):
+        predictor.predict_single(records[1])
+    predictions, probabilities, errors = predictor.predict_many(records)
+
+    assert model.VALIDATION_FAILURES.value - failures == 2
+    assert errors == {1: message}
+    assert predictions[1] == -1 and np.isnan(probabilities[1])
+    # sklearn sums its trees in thread order, so the last bit can differ between calls
+    assert predictor.predict_single(records[0])[1] == pytest.approx(probabilities[0], rel=1e-12)
+
+
+@pytest.mark.parametrize("engine", ["compiled", "fused"])
+def test_rebuild_leaves_mapped_artifact_intact(artifact_dir, dataset, engine):
+    mapped = LoanPredictor(engine=engine, artifact_dir=artifact_dir)
+    batch = mapped.synthetic_batch(200)
+    expected = mapped.predict_many(batch)
+    artifact = artifact_dir / f"{engine}_model.pkl"
+    inode = artifact.stat().st_ino
+
+    # A new model.pkl makes the artifact stale; the next predictor rebuilds it
+    joblib.dump(fit_forest(dataset, max_depth=8, random_state=1), artifact_dir / "model.pkl")
+    rebuilt = LoanPredictor(engine=engine, artifact_dir=artifact_dir)
+
+    assert rebuilt.engine == engine
+    assert artifact.stat().st_ino != inode  # replaced by rename, not rewritten in place
+    assert not list(artifact_dir.glob(".*.tmp"))
+    # The first predictor still reads its mapping of the old file
+    actual = mapped.predict_many(batch)
+    assert np.array_equal(actual[1], expected[1])
+
+
+@pytest.mark.parametrize("engine", ["compiled", "fused"])
+def test_predictor_falls_back_to_sklearn_without_parity(artifact_dir, engine, monkeypatch):
+    monkeypatch.setattr(model, "check_parity", lambda *args, **kwargs: False)
+    predictor = LoanPredictor(engine=engine, artifact_dir=artifact_dir)
+
+    assert predictor.engine == "sklearn"
+    assert isinstance(predictor.forest, RandomForestClassifier)
+    assert not (artifact_dir / f"{engine}_model.pkl").exists()
@@ -0,0 +1,90 @@
+"""InferenceExecutor load shedding and worker-process model sync"""
+import asyncio
+import shutil
+import threading
+from pathlib import Path
+
+import joblib
+import pytest
+
+import inference_pool
+from inference_pool import InferenceExecutor, QueueFullError
+from registry import DEFAULT_ENGINE, DEFAULT_TIER
+
+REPO = Path(__file__).resolve().parent.parent
+ARTIFACTS = ("model.pkl", "scaler.pkl", "label_encoders.pkl")
+
+
+def test_timed_out_work_keeps_its_slot_until_it_finishes():
+    release = threading.Event()
+    executor = InferenceExecutor(registry=None, workers=0, max_pending=1, timeout=0.05)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await executor._submit(release.wait, 5)
+        # Still running on the pool thread, so still pending
+        assert executor.pending == 1
+        with pytest.raises(QueueFullError):
+            await executor._submit(lambda: None)
+        release.set()
+        for _ in range(100):
+            if executor.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor.pending == 0
+        assert await executor._submit(lambda: 42) == 42
+        await asyncio.sleep(0.01)
+        assert executor.pending == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.fixture
+def worker_state(monkeypatch):
+    monkeypatch.setattr(inference_pool, "_registry", None)
+
+
+def copy_artifacts(directory, recompress_model=False):
+    directory.mkdir()
+    for name in ARTIFACTS:
+        shutil.copy(REPO / name, directory / name)
+    if recompress_model:
+        # Same model, different bytes: a new version
+        joblib.dump(joblib.load(REPO / "model.pkl"), directory / "model.pkl", compress=3)
+    return str(directory)
+
+
+def parent_config(artifact_dir):
+    predictor = inference_pool.ModelRegistry(artifact_dir).get(DEFAULT_ENGINE, DEFAULT_TIER)
+    predictor.load()
+    return (predictor.artifact_dir, predictor.version, DEFAULT_ENGINE, DEFAULT_TIER)
+
+
+def test_worker_follows_the_parent_to_a_new_directory(tmp_path, worker_state):
+    old_dir = copy_artifacts(tmp_path / "old")
+    new_dir = copy_artifacts(tmp_path / "new", recompress_model=True)
+    inference_pool._init_worker(old_dir, DEFAULT_ENGINE, DEFAULT_TIER)
+    old_config, new_config = parent_config(old_dir), parent_config(new_dir)
+    assert old_config[1] != new_config[1]
+
+    # First task arrives after the parent moved to new_dir
+    predictor = inference_pool._worker_predictor(*new_config)
+    assert (predictor.artifact_dir, predictor.version) == new_config[:2]
+    assert inference_pool._worker_predictor(*new_config) is predictor
+
+
+def test_worker_rebuilds_when_the_version_in_its_directory_changes(tmp_path, worker_state):
+    artifact_dir = copy_artifacts(tmp_path / "bundle")
+    inference_pool._init_worker(artifact_dir, DEFAULT_ENGINE, DEFAULT_TIER)
+    first = inference_pool._worker_predictor(*parent_config(artifact_dir))
+
+    joblib.dump(joblib.load(REPO / "model.pkl"), Path(artifact_dir) / "model.pkl", compress=3)
+    config = parent_config(artifact_dir)
+    predictor = inference_pool._worker_predictor(*config)
+
+    assert predictor is not first
+    assert predictor.version == config[1] != first.version
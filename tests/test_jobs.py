@@ -0,0 +1,94 @@
+"""BatchJobManager bookkeeping on a scratch SQLite database"""
+import io
+import sqlite3
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from jobs import JOB_COLUMNS, BatchJobManager
+from storage import Database
+
+PREDICTOR = SimpleNamespace(version="abc123", tier="full")
+
+
+def score_chunks(fileobj, user_id, predictor):
+    """One chunk in which every line of the file is scored 1 with probability 0.75"""
+    n_rows = len(fileobj.read().splitlines()) - 1
+    yield {
+        "count": n_rows,
+        "failed": 0,
+        "rows": np.arange(n_rows),
+        "valid": np.ones(n_rows, dtype=bool),
+        "ids": [f"id-{row}" for row in range(n_rows)],
+        "predictions": np.ones(n_rows, dtype=np.int64),
+        "probabilities": np.full(n_rows, 0.75),
+        "errors": {},
+    }
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = BatchJobManager(Database(str(tmp_path / "jobs.sqlite3")), score_chunks, tmp_path / "jobs",
+                              max_workers=1)
+    yield manager
+    manager.executor.shutdown(wait=True)
+
+
+def test_run_records_model_version_and_tier(manager):
+    job = manager.run(io.BytesIO(b"a,b\n1,2\n3,4\n"), "batch.csv", 7, PREDICTOR)
+
+    assert job["status"] == "completed" and job["rows_done"] == 2
+    assert (job["model_version"], job["model_tier"]) == ("abc123", "full")
+    assert not manager.input_path(job["id"]).exists()
+    assert "".join(manager.iter_results(job["id"])).splitlines()[1:] == ["0,id-0,1,0.75,", "1,id-1,1,0.75,"]
+
+
+def test_tables_from_before_tiers_gain_the_column(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    old_columns = [col for col in JOB_COLUMNS if col != "model_tier"]
+    conn.execute(f"CREATE TABLE batch_jobs ({', '.join(old_columns)})")
+    conn.execute("INSERT INTO batch_jobs (id, user_id, status) VALUES ('old', 7, 'completed')")
+    conn.commit()
+    conn.close()
+
+    manager = BatchJobManager(Database(path), score_chunks, tmp_path / "jobs", max_workers=1)
+    try:
+        assert manager.get("old", 7)["model_tier"] is None
+        job = manager.run(io.BytesIO(b"a\n1\n"), "batch.csv", 7, PREDICTOR)
+        assert job["model_tier"] == "full"
+    finally:
+        manager.executor.shutdown(wait=True)
+
+
+def test_sweep_removes_expired_jobs_and_their_files(tmp_path):
+    manager = BatchJobManager(Database(str(tmp_path / "jobs.sqlite3")), score_chunks, tmp_path / "jobs",
+                              max_workers=1, retention_seconds=3600)
+    try:
+        old, recent = (manager.run(io.BytesIO(b"a\n1\n"), "batch.csv", 7, PREDICTOR)["id"] for _ in range(2))
+        interrupted, queued = (manager._create(io.BytesIO(b"a\n1\n"), "batch.csv", 7) for _ in range(2))
+        now = datetime.utcnow()
+        manager._update(old, finished_at=(now - timedelta(hours=2)).isoformat())
+        # Interrupted by a restart: failed without a finished_at, input file left behind
+        manager._update(interrupted, status="failed", created_at=(now - timedelta(hours=3)).isoformat())
+        # Still queued, however old
+        manager._update(queued, created_at=(now - timedelta(hours=3)).isoformat())
+
+        assert manager.sweep(now) == 2
+        assert manager.get(old, 7) is None and manager.get(interrupted, 7) is None
+        assert not manager.results_path(old).exists() and not manager.input_path(interrupted).exists()
+        assert manager.get(recent, 7)["status"] == "completed" and manager.results_path(recent).exists()
+        assert manager.get(queued, 7)["status"] == "queued" and manager.input_path(queued).exists()
+        assert manager.sweep(now + timedelta(hours=2)) == 1
+        assert manager.get(recent, 7) is None and not manager.results_path(recent).exists()
+    finally:
+        manager.executor.shutdown(wait=True)
+
+
+def test_jobs_are_kept_without_a_retention_period(manager):
+    job = manager.run(io.BytesIO(b"a\n1\n"), "batch.csv", 7, PREDICTOR)
+
+    assert manager.sweep(datetime.utcnow() + timedelta(days=365)) == 0
+    assert manager.get(job["id"], 7)["status"] == "completed" and manager.results_path(job["id"]).exists()
@@ -0,0 +1,93 @@
+"""ModelRegistry configuration: the decision threshold, and reloads around train.py --install"""
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+import registry
+import train
+from decision_log import decision_log
+from model import LoanPredictor
+from registry import ModelRegistry
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("value, ok", [("0.35", True), ("", True), ("1.5", False), ("-0.1", False), ("high", False)])
+def test_threshold_setting_is_validated(value, ok):
+    env = {**os.environ, "LOAN_DECISION_THRESHOLD": value}
+    result = subprocess.run([sys.executable, "-c", "import registry; print(registry.DECISION_THRESHOLD)"],
+                            cwd=REPO, env=env, capture_output=True, text=True)
+    if ok:
+        assert result.returncode == 0
+        assert result.stdout.strip() == (value or "None")
+    else:
+        assert result.returncode != 0
+        assert "LOAN_DECISION_THRESHOLD must be a number in [0, 1]" in result.stderr
+
+
+def test_predictor_rejects_threshold_outside_unit_interval():
+    with pytest.raises(ValueError, match="decision_threshold"):
+        LoanPredictor(decision_threshold=1.2, lazy=True)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.5, 0.9])
+def test_registry_predictors_apply_and_log_the_threshold(monkeypatch, threshold):
+    monkeypatch.setattr(registry, "DECISION_THRESHOLD", threshold)
+    logged = []
+    monkeypatch.setattr(decision_log, "wants", lambda level: True)
+    monkeypatch.setattr(decision_log, "_offer", logged.append)
+    predictor = ModelRegistry(REPO).get()
+    batch = predictor.synthetic_batch(100)
+
+    predictions, probabilities, _ = predictor.predict_many(batch, request_ids=[f"r{i}" for i in range(100)])
+    single = predictor.predict_single(batch.iloc[0].to_dict(), request_id="single")
+
+    assert predictor.decision_threshold == threshold
+    assert np.array_equal(predictions, (probabilities >= threshold).astype(np.int64))
+    assert single == (int(probabilities[0] >= threshold), probabilities[0])
+    assert {record["threshold"] for record in logged} == {threshold}
+    assert ModelRegistry(REPO).status()["decision_threshold"] == threshold
+
+
+def copy_artifacts(directory, new_version=False):
+    directory.mkdir()
+    for name in train.ARTIFACTS:
+        if new_version:
+            # Same objects, different bytes: a new version of every file
+            joblib.dump(joblib.load(REPO / name), directory / name, compress=3)
+        else:
+            shutil.copy(REPO / name, directory / name)
+    return directory
+
+
+def test_reload_never_picks_up_a_half_installed_bundle(tmp_path, monkeypatch):
+    serving = copy_artifacts(tmp_path / "serving")
+    bundle = copy_artifacts(tmp_path / "bundle", new_version=True)
+    models = ModelRegistry(serving)
+    models.get().load()
+    old_version = models.get().version
+    new_version = models.version(bundle, tier="full")
+
+    mid_install = []
+    replace = os.replace
+
+    def replace_then_reload(src, dst):
+        replace(src, dst)
+        if Path(dst).name == "model.pkl":
+            mid_install.append((models.install_pending(), models.reload(wait=True)))
+
+    monkeypatch.setattr(train.os, "replace", replace_then_reload)
+    train.install(bundle, serving)
+
+    assert mid_install == [(True, False)]
+    assert models.get().version == old_version
+    assert (serving / "installed_version").read_text() == new_version
+    assert not models.install_pending()
+    assert models.reload(wait=True)
+    assert models.get().version == new_version
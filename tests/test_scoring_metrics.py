@@ -0,0 +1,58 @@
+"""Stage timings recorded by LoanPredictor, on the repository's artifacts"""
+import numpy as np
+import pytest
+
+from metrics import NORMALIZATIONS, STAGE_SECONDS
+from model import LoanPredictor
+
+MODEL_STAGES = ("normalize", "encode", "scale", "forest")
+
+
+@pytest.fixture(scope="module")
+def predictor():
+    predictor = LoanPredictor()
+    predictor.load()
+    if predictor.forest is None:
+        pytest.skip("model artifacts not available")
+    return predictor
+
+
+def samples():
+    return {stage: (sum(STAGE_SECONDS[stage].counts), STAGE_SECONDS[stage].sum) for stage in MODEL_STAGES}
+
+
+def recorded(before, after):
+    return {stage: after[stage][0] - before[stage][0] for stage in MODEL_STAGES}
+
+
+def test_predict_single_times_the_categorical_lookups(predictor):
+    record = predictor.synthetic_batch(1).iloc[0].to_dict()
+    record["marital_status"] = f"  {record['marital_status'].upper()} "
+    before, normalizations = samples(), NORMALIZATIONS.value
+    predictor.predict_single(record)
+    after = samples()
+
+    assert recorded(before, after) == dict.fromkeys(MODEL_STAGES, 1)
+    assert after["normalize"][1] > before["normalize"][1]
+    assert NORMALIZATIONS.value - normalizations == 1
+
+
+def test_predict_many_times_each_stage_once_per_batch(predictor):
+    before = samples()
+    predictor.predict_many(predictor.synthetic_batch(300))
+    after = samples()
+
+    assert recorded(before, after) == dict.fromkeys(MODEL_STAGES, 1)
+    assert all(after[stage][1] > before[stage][1] for stage in MODEL_STAGES)
+
+
+def test_encode_batch_with_precomputed_codes(predictor):
+    frame = predictor._batch_to_frame(predictor.synthetic_batch(50))
+    frame.loc[3, "loan_purpose"] = "not a purpose"
+    codes = predictor._normalize_batch(frame)
+    X, errors = predictor._encode_batch(frame, codes)
+    X_again, errors_again = predictor._encode_batch(frame)
+
+    assert codes["loan_purpose"][3] == -1
+    assert np.array_equal(X, X_again, equal_nan=True)
+    assert errors == errors_again and list(errors) == [3]